@@ -8,16 +8,270 @@ This script:
 3. Results in a complete, deployable documentation site
 """
 
+import argparse
+import json
+import os
+import re
 import shutil
+import signal
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
-from pixeltable_doctools.changelog.fetch_releases import generate_changelog_to_dir
+from pixeltable_doctools.build_cache import BuildCache, hash_inputs
+from pixeltable_doctools.changelog import fetch_releases
+from pixeltable_doctools.changelog.fetch_releases import fetch_releases_etag, generate_changelog_to_dir
 from pixeltable_doctools.convert_notebooks.convert_notebooks import convert_notebooks_to_dir
+from pixeltable_doctools.fileutils import iter_files, sync_tree
+from pixeltable_doctools.procutils import LineReader, run_step, run_streamed, step_output
 
+DOCTOOLS_DIR = Path(__file__).parent
 
-def validate_mintlify_docs(target_dir: Path) -> list[str]:
+# Subdirectories of target/docs that are produced by the build rather than copied from docs/mintlify
+GENERATED_DIRS = ('notebooks', 'changelog', 'sdk')
+
+# Mintlify prints its local preview URL once it has finished parsing the docs
+MINTLIFY_READY_RE = re.compile(r'\blocal:|\bready\b', re.IGNORECASE)
+
+# Upper bound on how long to wait for a new mintlify server to report that it is ready. This is the fixed wait
+# used before the ready check was added, so validation is never slower if the ready message is not recognized.
+MINTLIFY_STARTUP_TIMEOUT = 5
+
+# How long the log of a persistent mintlify server must stay unchanged for a reparse to be considered finished
+MINTLIFY_SETTLE_TIME = 0.5
+
+# Subdirectory of target/ holding the state file and log of a persistent mintlify server
+MINTLIFY_SERVER_STATE_DIR = '.mintlify-server'
+
+# Path of the file that a mintlify parsing error refers to
+_ERROR_PATH_RE = re.compile(r'[\w./-]+\.mdx?\b')
+
+
+def _source_files(root: Path, pattern: str) -> list[Path]:
+    """List files under `root` matching `pattern`, skipping notebook checkpoints."""
+    return [path for path in root.rglob(pattern) if '.ipynb_checkpoints' not in path.parts]
+
+
+@lru_cache(maxsize=1)
+def mintlify_command() -> tuple[str, ...]:
+    """
+    Return the command that runs the Mintlify CLI.
+
+    Prefers a `mintlify` executable on the PATH or in `./node_modules/.bin`, which is run directly; `npx` spends
+    several hundred milliseconds starting Node just to locate the package. Falls back to `npx mintlify`.
+    """
+    mintlify = shutil.which('mintlify') or shutil.which('mintlify', path=str(Path.cwd() / 'node_modules' / '.bin'))
+    return (mintlify,) if mintlify else ('npx', 'mintlify')
+
+
+def _process_start_time(pid: int) -> str | None:
+    """
+    Return the start time of the process with the given pid, or None if no such process is running.
+
+    Together with the pid, the start time identifies a process; unlike a bare liveness check, it tells a server
+    apart from an unrelated process that later reused its pid.
+    """
+    result = subprocess.run(['ps', '-o', 'lstart=', '-p', str(pid)], capture_output=True, text=True)
+    return (result.stdout.strip() or None) if result.returncode == 0 else None
+
+
+def _latest_change(target_dir: Path) -> float:
+    """
+    Return the latest status change time (ctime) of any file under `target_dir`.
+
+    The ctime is used rather than the mtime, since syncing preserves the source files' mtimes.
+    """
+    return max((os.stat(path).st_ctime for path in iter_files(target_dir)), default=0.0)
+
+
+def _wait_for_log_to_settle(log_path: Path, offset: int) -> None:
+    """
+    Wait for a persistent mintlify server to finish reparsing changed files.
+
+    Mintlify prints no dependable end-of-reparse message, so the reparse is considered finished once the log has
+    grown past `offset` and then stayed unchanged for `MINTLIFY_SETTLE_TIME` seconds. Gives up after
+    `MINTLIFY_STARTUP_TIMEOUT` seconds (e.g. if the reparse logged nothing).
+    """
+    deadline = time.monotonic() + MINTLIFY_STARTUP_TIMEOUT
+    size = offset
+    last_growth = time.monotonic()
+    while time.monotonic() < deadline:
+        new_size = log_path.stat().st_size
+        if new_size != size:
+            size = new_size
+            last_growth = time.monotonic()
+        elif size > offset and time.monotonic() - last_growth >= MINTLIFY_SETTLE_TIME:
+            return
+        time.sleep(0.1)
+
+
+def _error_file(error: str, target_dir: Path) -> str | None:
+    """Return the path of the file a parsing error refers to, or None if it names no existing file."""
+    m = _ERROR_PATH_RE.search(error)
+    if m is None:
+        return None
+    path = target_dir / m.group(0)
+    return str(path) if path.is_file() else None
+
+
+def _stop_server_group(pid: int) -> None:
+    """
+    Stop a persistent mintlify server and any processes it started.
+
+    The server is the leader of its own session (and process group), so signalling the group also reaches the
+    node processes it spawns (e.g. when started through `npx`).
+    """
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def stop_persistent_server(state_dir: Path) -> bool:
+    """
+    Stop the persistent `mintlify dev` server recorded in `state_dir`, if it is still running.
+
+    Args:
+        state_dir: Directory holding the server's state file and log
+
+    Returns:
+        True if a running server was stopped
+    """
+    state_path = state_dir / 'mintlify.json'
+    if not state_path.exists():
+        return False
+    state = json.loads(state_path.read_text(encoding='utf-8'))
+    pid = state.get('pid')
+    is_running = pid is not None and state.get('start_time') == _process_start_time(pid)
+    if is_running:
+        _stop_server_group(pid)
+    state_path.unlink()
+    return is_running
+
+
+def _persistent_server_errors(target_dir: Path, state_dir: Path) -> list[str]:
+    """
+    Return the outstanding parsing errors reported by a persistent `mintlify dev` server.
+
+    The server is started on first use and then keeps running between builds, reparsing `target_dir` whenever
+    its files change. This avoids paying for Mintlify startup on every build. The server is restarted if it has
+    exited or was started for a different directory.
+
+    The server only reports errors in files as it (re)parses them, so reported errors are kept in the state file
+    and reported again by later validations, until the file they refer to changes (if it is still broken, the
+    server reports it again when reparsing it). Errors that do not name a file can only be cleared by a full
+    reparse, so they cause the server to be restarted on the next validation.
+
+    Args:
+        target_dir: Directory containing built documentation
+        state_dir: Directory holding the server's state file and log
+
+    Returns:
+        Outstanding parsing errors
+    """
+    state_path = state_dir / 'mintlify.json'
+    log_path = state_dir / 'mintlify.log'
+    state = json.loads(state_path.read_text(encoding='utf-8')) if state_path.exists() else {}
+    pid = state.get('pid')
+    # Maps each outstanding error to the file it refers to and the time it was reported
+    errors: dict[str, tuple[str | None, float]] = state.get('errors', {})
+
+    is_running = pid is not None and state.get('start_time') == _process_start_time(pid)
+    if (
+        is_running
+        and state.get('cwd') == str(target_dir)
+        and all(file is not None for file, _ in errors.values())
+    ):
+        if _latest_change(target_dir) > state['validated_at']:
+            _wait_for_log_to_settle(log_path, state['offset'])
+        # Drop errors in files that have changed since the errors were reported
+        kept = {}
+        for error, (file, reported_at) in errors.items():
+            try:
+                if os.stat(file).st_ctime <= reported_at:
+                    kept[error] = (file, reported_at)
+            except FileNotFoundError:
+                pass
+        errors = kept
+    else:
+        if is_running:
+            _stop_server_group(pid)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'wb') as log:
+            proc = subprocess.Popen(
+                [*mintlify_command(), 'dev', '--port', '3001', '--no-open'],
+                cwd=str(target_dir),
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,  # Keep running after this process exits
+            )
+        print(f"   Started persistent mintlify server (pid {proc.pid}) at http://localhost:3001")
+        state = {'pid': proc.pid, 'start_time': _process_start_time(proc.pid), 'cwd': str(target_dir), 'offset': 0}
+        errors = {}
+        # The parsing errors appear on startup, before the server reports that it is ready
+        deadline = time.monotonic() + MINTLIFY_STARTUP_TIMEOUT
+        while time.monotonic() < deadline and proc.poll() is None:
+            if MINTLIFY_READY_RE.search(log_path.read_text(encoding='utf-8', errors='replace')):
+                break
+            time.sleep(0.1)
+
+    with open(log_path, 'rb') as log:
+        log.seek(state['offset'])
+        output = log.read().decode(errors='replace')
+        state['offset'] = log.tell()
+    now = time.time()
+    for error in _parsing_errors(output):
+        errors[error] = (_error_file(error, target_dir), now)
+    state['errors'] = errors
+    state['validated_at'] = now
+    state_path.write_text(json.dumps(state), encoding='utf-8')
+    return list(errors)
+
+
+def _parsing_errors(output: str) -> list[str]:
+    """Extract the parsing error lines from mintlify's output."""
+    return [line.strip() for line in output.split('\n') if 'parsing error' in line.lower() and line.strip()]
+
+
+def _one_shot_server_output(target_dir: Path) -> str:
+    """
+    Start `mintlify dev` in `target_dir` and return its startup output.
+
+    Parsing errors appear immediately on startup, so the output is streamed and the server is stopped shortly
+    after the first error is reported or once it reports that it is ready, whichever comes first.
+    """
+    proc = subprocess.Popen(
+        [*mintlify_command(), 'dev', '--port', '3001', '--no-open'],
+        cwd=str(target_dir),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors='replace',
+    )
+    reader = LineReader(proc.stdout)
+    lines: list[str] = []
+    deadline = time.monotonic() + MINTLIFY_STARTUP_TIMEOUT
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            line = reader.readline(timeout=remaining)
+            if not line:
+                break  # Timed out, or the server exited
+            lines.append(line)
+            if 'parsing error' in line.lower() or MINTLIFY_READY_RE.search(line):
+                # Errors are reported together; allow a short grace period to collect the rest
+                deadline = min(deadline, time.monotonic() + 0.5)
+    finally:
+        proc.kill()
+        proc.wait()
+    return ''.join(lines)
+
+
+def validate_mintlify_docs(target_dir: Path, server_state_dir: Path | None = None) -> list[str]:
     """
     Validate Mintlify documentation for parsing errors.
 
@@ -25,6 +279,9 @@ def validate_mintlify_docs(target_dir: Path) -> list[str]:
 
     Args:
         target_dir: Directory containing built documentation
+        server_state_dir: If specified, validate against a persistent `mintlify dev` server whose state is kept
+            in this directory, rather than starting a new one (not supported on Windows). Errors are reported
+            until the file they refer to changes.
 
     Returns:
         List of parsing error messages (empty if no errors)
@@ -33,38 +290,13 @@ def validate_mintlify_docs(target_dir: Path) -> list[str]:
     print(f"\nValidating documentation ...")
 
     try:
-        # Run mintlify dev with a short timeout to capture parsing errors
-        # The parsing errors appear in stderr immediately on startup
-        result = subprocess.run(
-            ['npx', 'mintlify', 'dev', '--port', '3001', '--no-open'],
-            cwd=str(target_dir),
-            capture_output=True,
-            text=True,
-            timeout=5  # Just need a few seconds to capture initial parsing
-        )
-    except subprocess.TimeoutExpired as e:
-        # Timeout is expected - we just want to capture the initial output
-        stderr_output = e.stderr.decode() if isinstance(e.stderr, bytes) else e.stderr
-        stdout_output = e.stdout.decode() if isinstance(e.stdout, bytes) else e.stdout
+        if server_state_dir is not None and sys.platform != 'win32':
+            errors = _persistent_server_errors(target_dir, server_state_dir)
+        else:
+            errors = _parsing_errors(_one_shot_server_output(target_dir))
     except Exception as e:
         # If validation command fails, return a warning but don't fail the build
         return [f"⚠️  Could not run validation: {str(e)}"]
-    else:
-        # If command completed, use its output
-        stderr_output = result.stderr
-        stdout_output = result.stdout
-
-    # Parse output for error messages
-    errors = []
-    output = (stderr_output or '') + (stdout_output or '')
-
-    for line in output.split('\n'):
-        # Look for parsing error lines
-        if 'parsing error' in line.lower():
-            # Clean up the line for display
-            clean_line = line.strip()
-            if clean_line:
-                errors.append(clean_line)
 
     if errors:
         print(f"   Found {len(errors)} error(s):")
@@ -76,9 +308,95 @@ def validate_mintlify_docs(target_dir: Path) -> list[str]:
     return errors
 
 
-def build_mintlify(pxt_repo_dir: Path, no_errors: bool = False) -> None:
+def _build_notebooks(pxt_repo_dir: Path, target_dir: Path) -> None:
+    """Generate notebooks to target/docs/notebooks/."""
+    # Not a build cache step: converted notebooks are already cached individually by content, and only
+    # notebooks that are newer than their output are looked up
+    print(f"\nGenerating notebooks ...")
+    convert_notebooks_to_dir(pxt_repo_dir, target_dir)
+
+
+def _build_changelog(cache: BuildCache, target_dir: Path, force: bool) -> None:
+    """Generate changelog to target/docs/changelog/."""
+    print(f"\nGenerating changelog from GitHub releases ...")
+    output_dir = target_dir / 'docs'
+    releases_etag = fetch_releases_etag()
+    digest = None if releases_etag is None else hash_inputs([Path(fetch_releases.__file__)], releases_etag)
+    cache.run(
+        'changelog', digest, output_dir, ['changelog'],
+        # Staged under target/, outside the published docs
+        lambda: generate_changelog_to_dir(output_dir / 'changelog', work_dir=target_dir),
+        force=force,
+    )
+
+
+def _sync_source(source_dir: Path, output_dir: Path, jobs: int | None) -> None:
+    """Sync mintlify source to target, copying only changed files. Generated output is preserved."""
+    print(f"\nCopying source files from {source_dir} to {output_dir}")
+    start = time.perf_counter()
+    sync_tree(source_dir, output_dir, keep=GENERATED_DIRS, jobs=jobs)
+    print(f"   Copied source files in {time.perf_counter() - start:.1f}s")
+
+
+def _run_mintlifier(pxt_repo_dir: Path, no_errors: bool) -> None:
+    """Run mintlifier - it writes directly to target."""
+    # For stage/prod targets, hide errors from generated docs
+    mintlifier_cmd = ['mintlifier']
+    if no_errors:
+        mintlifier_cmd.append('--no-errors')
+
+    try:
+        run_streamed(mintlifier_cmd, cwd=pxt_repo_dir)  # Run from repo root
+    except subprocess.CalledProcessError:
+        print(f"❌ Error running mintlifier", file=sys.stderr)
+        raise
+
+
+def _build_sdk(pxt_repo_dir: Path, cache: BuildCache, no_errors: bool, force: bool) -> None:
+    """Generate SDK docs; mintlifier writes directly to target/docs/sdk/latest and updates target/docs/docs.json."""
+    docs_dir = pxt_repo_dir / 'docs'
+    opml_file = docs_dir / 'public_api.opml'
+    output_dir = pxt_repo_dir / 'target' / 'docs'
+    print(f"\nRunning mintlifier to generate SDK documentation...")
+    print(f"   OPML: {opml_file}")
+    print(f"   Output: {output_dir}")
+    digest = hash_inputs(
+        [
+            opml_file,
+            docs_dir / 'mintlify' / 'docs.json',
+            *_source_files(pxt_repo_dir / 'pixeltable', '*.py'),
+            *_source_files(DOCTOOLS_DIR / 'mintlifier', '*.py'),
+        ],
+        f'no_errors={no_errors}',
+    )
+    cache.run(
+        'mintlifier', digest, output_dir, ['sdk/latest', 'docs.json'],
+        lambda: _run_mintlifier(pxt_repo_dir, no_errors),
+        force=force,
+    )
+
+
+def build_mintlify(
+    pxt_repo_dir: Path,
+    no_errors: bool = False,
+    jobs: int | None = None,
+    force: bool = False,
+    clean_cache: bool = False,
+    keep_server: bool = False,
+) -> None:
     """
     Build Mintlify documentation site.
+
+    The notebook, changelog, and mintlifier steps are skipped when their inputs are unchanged since the
+    previous build; their outputs are restored from `target/.build-cache/` instead.
+
+    Args:
+        pxt_repo_dir: Path to the pixeltable repository root
+        no_errors: Hide errors in the generated SDK docs
+        jobs: Number of worker threads used to copy source files (defaults to a multiple of the CPU count)
+        force: Regenerate all outputs, even if their inputs are unchanged
+        clean_cache: Delete the build cache before building
+        keep_server: Validate against a `mintlify dev` server that keeps running between builds
     """
     print(f"Building docs from repository: {pxt_repo_dir}")
 
@@ -96,62 +414,33 @@ def build_mintlify(pxt_repo_dir: Path, no_errors: bool = False) -> None:
     if not opml_file.exists():
         raise FileNotFoundError(f"OPML file not found: {opml_file}")
 
+    cache = BuildCache(target_dir / '.build-cache')
+    if clean_cache:
+        print(f"\nClearing build cache: {cache.cache_dir}")
+        cache.clear()
+
     # Step 1: Prepare target directory
     print(f"\nPreparing output directory: {output_dir}")
     output_dir.mkdir(exist_ok=True, parents=True)
 
-    # Step 2: Generate notebooks to docs/mintlify/notebooks/
-    print(f"\nGenerating notebooks ...")
-    convert_notebooks_to_dir(pxt_repo_dir, target_dir)
-
-    # Step 3: Generate changelog to docs/mintlify/changelog/
-    print(f"\nGenerating changelog from GitHub releases ...")
-    generate_changelog_to_dir(output_dir / 'changelog')
-
-    # Step 4: Copy mintlify source to target
-    print(f"\nCopying source files from {source_dir} to {output_dir}")
-    for item in source_dir.iterdir():
-        if item.name.startswith('.'):
-            continue  # Skip hidden files
-        dest = output_dir / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest, dirs_exist_ok=True)
-        else:
-            shutil.copy2(item, dest)
-
-    # Step 5: Run mintlifier to generate SDK docs
-    # Mintlifier now writes directly to target/docs/sdk/latest and updates target/docs/docs.json
-    print(f"\nRunning mintlifier to generate SDK documentation...")
-    print(f"   OPML: {opml_file}")
-    print(f"   Output: {output_dir}")
-
-    try:
-        # Run mintlifier - it writes directly to target
-        # For stage/prod targets, hide errors from generated docs
-        mintlifier_cmd = ['mintlifier']
-        if no_errors:
-            mintlifier_cmd.append('--no-errors')
-
-        result = subprocess.run(
-            mintlifier_cmd,
-            cwd=str(pxt_repo_dir),  # Run from repo root
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(result.stdout)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running mintlifier:", file=sys.stderr)
-        print(e.stdout, file=sys.stderr)
-        print(e.stderr, file=sys.stderr)
-        raise
+    # Steps 2-5: The source sync, notebooks, changelog, and SDK docs write to disjoint subdirectories, so they
+    # run concurrently. The notebook and changelog steps are mostly waiting on Quarto and the GitHub API. Each
+    # step's output lines are prefixed with its name.
+    with step_output(), ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(run_step, 'notebooks', _build_notebooks, pxt_repo_dir, target_dir),
+            executor.submit(run_step, 'changelog', _build_changelog, cache, target_dir, force),
+        ]
+        # The source sync must precede mintlifier, which updates the copied docs.json
+        run_step('source', _sync_source, source_dir, output_dir, jobs)
+        run_step('sdk', _build_sdk, pxt_repo_dir, cache, no_errors, force)
+        for future in futures:
+            future.result()
 
     print(f"\nDocumentation build complete!")
     print(f"   Output directory: {output_dir}")
 
-    validation_errors = validate_mintlify_docs(output_dir)
+    validation_errors = validate_mintlify_docs(output_dir, target_dir / MINTLIFY_SERVER_STATE_DIR if keep_server else None)
     if validation_errors:
         print(f"\n   Tip: Check the source docstrings for formatting issues", file=sys.stderr)
         print(f"   Run: cd {output_dir} && npx mintlify dev", file=sys.stderr)
@@ -160,6 +449,36 @@ def build_mintlify(pxt_repo_dir: Path, no_errors: bool = False) -> None:
 
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description='Build the Mintlify documentation site')
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Number of worker threads used to copy source files (default: based on CPU count)'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Regenerate all outputs, even if their inputs are unchanged since the previous build'
+    )
+    parser.add_argument(
+        '--clean-cache',
+        action='store_true',
+        help='Delete the build cache before building'
+    )
+    parser.add_argument(
+        '--keep-server',
+        action='store_true',
+        help='Validate against a mintlify dev server that keeps running between builds (at http://localhost:3001); '
+             'only errors in files changed since the previous build are reported'
+    )
+    parser.add_argument(
+        '--stop-server',
+        action='store_true',
+        help='Stop the mintlify dev server started by --keep-server, then exit without building'
+    )
+    args = parser.parse_args()
+
     try:
         import pixeltable as pxt
 
@@ -173,7 +492,14 @@ def main():
         print(f"Error: Please run this script from the pixeltable repository root.")
         sys.exit(1)
 
-    build_mintlify(pxt_repo_dir)
+    if args.stop_server:
+        if stop_persistent_server(pxt_repo_dir / 'target' / MINTLIFY_SERVER_STATE_DIR):
+            print("Stopped persistent mintlify server.")
+        else:
+            print("No persistent mintlify server is running.")
+        return
+
+    build_mintlify(pxt_repo_dir, jobs=args.jobs, force=args.force, clean_cache=args.clean_cache, keep_server=args.keep_server)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+"""
+Content-hash cache for incremental documentation builds.
+
+Each build step is keyed by a SHA-256 digest of its inputs. When the digest matches the one recorded by a
+previous build, the step's outputs are restored from the cache instead of being regenerated.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+from pixeltable_doctools.fileutils import copy_item, default_jobs, remove_tree, replace_dir, sync_tree
+
+# Files larger than this are hashed through a memory map rather than read into buffers
+MMAP_THRESHOLD = 1 << 20
+
+
+def hash_file(path: Path) -> bytes:
+    """Return the SHA-256 digest of a file's contents."""
+    with open(path, 'rb', buffering=0) as fp:
+        if os.fstat(fp.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).digest()
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+; reads into an internal buffer
+            return hashlib.file_digest(fp, 'sha256').digest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: fp.read(1 << 20), b''):
+            h.update(chunk)
+        return h.digest()
+
+
+def hash_inputs(files: Iterable[Path], *extra: str, root: Path | None = None) -> str:
+    """
+    Compute a combined digest over a set of input files and any extra key strings.
+
+    Files are hashed in sorted order together with their paths, so that renames also change the digest. The
+    individual files are hashed in parallel, since hashlib releases the GIL while hashing.
+
+    Args:
+        files: Input files
+        extra: Additional strings that affect the output (e.g. command-line flags)
+        root: If given, paths are hashed relative to `root`, so that the digest does not depend on where the
+            files are located
+
+    Returns:
+        Hex digest of all inputs
+    """
+    h = hashlib.sha256()
+    for value in extra:
+        h.update(value.encode('utf-8') + b'\0')
+    paths = sorted(files)
+    with ThreadPoolExecutor(max_workers=default_jobs()) as executor:
+        for path, file_digest in zip(paths, executor.map(hash_file, paths), strict=True):
+            name = str(path) if root is None else path.relative_to(root).as_posix()
+            h.update(name.encode('utf-8') + b'\0')
+            h.update(file_digest)
+    return h.hexdigest()
+
+
+class BuildCache:
+    """
+    Stores the outputs of build steps, keyed by a digest of their inputs.
+
+    Steps may run concurrently; updates to the shared manifest are serialized.
+    """
+
+    def __init__(self, cache_dir: Path):
+        """Initialize with the directory holding the manifest and cached outputs."""
+        self.cache_dir = cache_dir
+        self.manifest_path = cache_dir / 'manifest.json'
+        self.manifest: dict[str, str] = {}
+        self._lock = threading.Lock()
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+
+    def clear(self) -> None:
+        """Delete all cached outputs."""
+        if self.cache_dir.exists():
+            remove_tree(self.cache_dir)
+        self.manifest = {}
+
+    def is_fresh(self, step: str, digest: str) -> bool:
+        """Return True if the cached outputs of `step` were produced from inputs with the given digest."""
+        return self.manifest.get(step) == digest and (self.cache_dir / step).is_dir()
+
+    def restore(self, step: str, output_dir: Path, outputs: list[str]) -> None:
+        """
+        Copy the cached outputs of `step` into `output_dir`.
+
+        Directories are synced rather than recopied, so outputs that are already in place cost only a directory
+        walk.
+        """
+        for relpath in outputs:
+            src = self.cache_dir / step / relpath
+            dest = output_dir / relpath
+            if src.is_dir():
+                sync_tree(src, dest, exclude=())
+            elif src.exists():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                copy_item(src, dest)
+
+    def store(self, step: str, digest: str, output_dir: Path, outputs: list[str]) -> None:
+        """
+        Save the outputs of `step` from `output_dir` and record their input digest.
+
+        The outputs are copied into a staging directory that then replaces the step's cache entry, so an
+        interrupted build never leaves a partially written entry behind.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = Path(tempfile.mkdtemp(prefix=f'.{step}.new-', dir=self.cache_dir))
+        try:
+            for relpath in outputs:
+                src = output_dir / relpath
+                if src.exists():
+                    dest = staging_dir / relpath
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    copy_item(src, dest)
+            replace_dir(staging_dir, self.cache_dir / step)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        with self._lock:
+            self.manifest[step] = digest
+            self.manifest_path.write_text(json.dumps(self.manifest, indent=2), encoding='utf-8')
+
+    def run(
+        self,
+        step: str,
+        digest: str | None,
+        output_dir: Path,
+        outputs: list[str],
+        generate: Callable[[], None],
+        force: bool = False,
+    ) -> None:
+        """
+        Run a build step, or restore its outputs from the cache if its inputs are unchanged.
+
+        Args:
+            step: Name of the build step
+            digest: Digest of the step's inputs, or None if it cannot be determined (the step always runs)
+            output_dir: Directory the step writes into
+            outputs: Paths (relative to `output_dir`) produced by the step
+            generate: Function that runs the step
+            force: Run the step even if its cached outputs are fresh
+        """
+        if digest is not None and not force and self.is_fresh(step, digest):
+            print(f"   Inputs unchanged; restoring {step} from cache.")
+            self.restore(step, output_dir, outputs)
+            return
+
+        generate()
+        if digest is not None:
+            self.store(step, digest, output_dir, outputs)
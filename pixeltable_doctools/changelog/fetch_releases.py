@@ -11,16 +11,98 @@ This script:
 
 import json
 import re
+import shutil
+import time
+import urllib.error
 import urllib.request
 from datetime import datetime
+from functools import lru_cache
+from http.client import HTTPResponse
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
+from pixeltable_doctools.config import get_cache_dir
+from pixeltable_doctools.fileutils import replace_dir
+
+# Transient server errors that are worth retrying, and how many attempts to make in total
+RETRY_STATUSES = (502, 503, 504)
+MAX_ATTEMPTS = 3
+
+# Fixed header of the consolidated changelog, encoded once
+CHANGELOG_HEADER = """---
+title: "Changelog"
+description: "Release history and updates for Pixeltable"
+---
+
+## Contributors
+
+Pixeltable is built by a vibrant community of contributors. We're grateful for everyone who has helped make Pixeltable better!
+
+**Want to contribute?** Check out our [Contributing Guide](https://github.com/pixeltable/pixeltable/blob/main/CONTRIBUTING.md) to get started.
+
+**Top Contributors:** View our amazing contributors on [GitHub](https://github.com/pixeltable/pixeltable/graphs/contributors).
+
+---
+
+## Release History
+
+View the complete release history for Pixeltable below. Each release includes detailed information about new features, bug fixes, and improvements.
+
+For the latest release information, visit our [GitHub Releases page](https://github.com/pixeltable/pixeltable/releases).
+
+---
+
+""".encode('utf-8')
+
+# Separator written after each release in the consolidated changelog
+RELEASE_SEPARATOR = b"\n\n---\n\n"
+
+# Fields of a GitHub API release used by the changelog; the rest (assets, reactions, etc.) are discarded
+RELEASE_FIELDS = ('tag_name', 'name', 'published_at', 'author', 'html_url', 'body')
+_get_release_fields = itemgetter(*RELEASE_FIELDS)
+
+# Full URL of a pixeltable PR; compiled once since it is applied to every release body
+_PR_LINK_RE = re.compile(r'https://github\.com/pixeltable/pixeltable/pull/(\d+)')
+
+# The rewrites applied to each release body, fused so that the body is scanned only once: H2 headings at the
+# start of a line (group 0 only) and full PR URLs (group 1 is the PR number)
+_BODY_REWRITE_RE = re.compile(rf'^## |{_PR_LINK_RE.pattern}', re.MULTILINE)
+
+
+def _urlopen_with_retry(request: urllib.request.Request) -> HTTPResponse:
+    """Open `request`, retrying with exponential backoff if GitHub returns a transient server error."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return urllib.request.urlopen(request, timeout=30)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS - 1:
+                raise
+        time.sleep(0.3 * 2**attempt)
+    raise AssertionError('unreachable')
+
+
+def _project_release(release: dict[str, Any]) -> dict[str, Any]:
+    """Keep only the fields of a GitHub API release that the changelog uses (and that are present)."""
+    projected = {key: release[key] for key in RELEASE_FIELDS if key in release}
+    if isinstance(projected.get('author'), dict) and 'login' in projected['author']:
+        projected['author'] = {'login': projected['author']['login']}
+    return projected
+
+
+def _releases_cache_path(repo: str) -> Path:
+    """Path of the file caching the last releases listing fetched for `repo`, along with its validators."""
+    return get_cache_dir() / 'releases' / f"{repo.replace('/', '__')}.json"
+
 
 def fetch_releases_from_github(repo: str = "pixeltable/pixeltable", max_releases: int = 50) -> list[dict[str, Any]]:
     """
     Fetch releases from GitHub API.
 
+    The last response is cached on disk together with its `ETag` and `Last-Modified` headers, and sent back
+    as a conditional request; if the releases have not changed, GitHub answers with an empty 304 response
+    (which also does not count against the API rate limit) and the cached listing is returned.
+
     Args:
         repo: GitHub repository in format 'owner/repo'
         max_releases: Maximum number of releases to fetch
@@ -29,13 +111,63 @@ def fetch_releases_from_github(repo: str = "pixeltable/pixeltable", max_releases
         List of release dictionaries from GitHub API
     """
     url = f"https://api.github.com/repos/{repo}/releases?per_page={max_releases}"
+    cache_path = _releases_cache_path(repo)
+
+    cached: dict[str, Any] | None
+    try:
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cached = None  # No usable cache
+    if cached is not None and cached.get('url') != url:
+        cached = None
+
+    headers = {'Accept': 'application/vnd.github+json'}
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
 
     try:
-        with urllib.request.urlopen(url) as response:
-            releases = json.loads(response.read().decode())
-        return releases
+        with _urlopen_with_retry(urllib.request.Request(url, headers=headers)) as response:
+            releases = [_project_release(release) for release in json.load(response)]
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached is not None:
+            return cached['releases']
+        raise RuntimeError(f"Failed to fetch releases from GitHub: {e}") from e
     except Exception as e:
-        raise RuntimeError(f"Failed to fetch releases from GitHub: {e}")
+        raise RuntimeError(f"Failed to fetch releases from GitHub: {e}") from e
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(
+        json.dumps({'url': url, 'etag': etag, 'last_modified': last_modified, 'releases': releases}),
+        encoding='utf-8'
+    )
+    return releases
+
+
+def fetch_releases_etag(repo: str = "pixeltable/pixeltable", max_releases: int = 50) -> str | None:
+    """
+    Fetch the ETag of the GitHub releases listing without downloading it.
+
+    The ETag changes whenever the releases change, so it can be used as a cache key for the changelog.
+
+    Args:
+        repo: GitHub repository in format 'owner/repo'
+        max_releases: Maximum number of releases to fetch
+
+    Returns:
+        The ETag header value, or None if it could not be retrieved
+    """
+    url = f"https://api.github.com/repos/{repo}/releases?per_page={max_releases}"
+
+    try:
+        with _urlopen_with_retry(urllib.request.Request(url, method='HEAD')) as response:
+            return response.headers.get('ETag')
+    except Exception:
+        return None
 
 
 def linkify_github_mentions(text: str) -> str:
@@ -77,10 +209,71 @@ def shorten_pr_links(text: str) -> str:
     Returns:
         Text with shortened PR links
     """
+    if '/pull/' not in text:
+        return text  # Fast path: no PR links to shorten
+
     # Match full PR URLs and replace with [#number](url) markdown link
-    pattern = r'https://github\.com/pixeltable/pixeltable/pull/(\d+)'
-    replacement = r'[#\1](https://github.com/pixeltable/pixeltable/pull/\1)'
-    return re.sub(pattern, replacement, text)
+    return _PR_LINK_RE.sub(r'[#\1](https://github.com/pixeltable/pixeltable/pull/\1)', text)
+
+
+@lru_cache(maxsize=None)
+def _format_date(published_at: str) -> str:
+    """Format a GitHub API timestamp (e.g. '2025-01-31T12:00:00Z') for display, e.g. 'January 31, 2025'."""
+    if not published_at:
+        return 'Unknown date'
+    try:
+        date_obj = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+        return date_obj.strftime('%B %d, %Y')
+    except Exception:
+        return published_at
+
+
+def _release_fields(release: dict[str, Any]) -> tuple[str, str, str, str, str, str]:
+    """
+    Extract the fields shown for a release.
+
+    Args:
+        release: Release dictionary from GitHub API
+
+    Returns:
+        Tuple of (tag name, release name, formatted date, author login, release URL, stripped body)
+    """
+    try:
+        tag_name, name, published_at, author, html_url, body = _get_release_fields(release)
+    except KeyError:
+        # Fill in defaults for missing fields (the GitHub API always includes them all)
+        tag_name = release.get('tag_name', 'Unknown')
+        defaults = {'name': tag_name, 'published_at': '', 'author': {}, 'html_url': '', 'body': ''}
+        tag_name, name, published_at, author, html_url, body = _get_release_fields(
+            {**defaults, **release, 'tag_name': tag_name}
+        )
+    return tag_name, name, _format_date(published_at), author.get('login', 'Unknown'), html_url, body.strip()
+
+
+def _rewrite_body_match(match: re.Match) -> str:
+    pr_number = match.group(1)
+    if pr_number is None:
+        return '#### '
+    return f'[#{pr_number}](https://github.com/pixeltable/pixeltable/pull/{pr_number})'
+
+
+def format_release_body(body: str) -> str:
+    """
+    Format a release body for inclusion in the consolidated changelog.
+
+    Demotes H2 sections to H4 for proper sidebar hierarchy (GitHub release notes use ## for "What's Changed"
+    and "New Contributors"), links @username mentions, and shortens PR links, as in `shorten_pr_links()`.
+
+    Args:
+        body: Markdown body of a release
+
+    Returns:
+        Formatted body
+    """
+    body = linkify_github_mentions(body)
+    if '## ' not in body and '/pull/' not in body:
+        return body  # Fast path: no headings or PR links to rewrite
+    return _BODY_REWRITE_RE.sub(_rewrite_body_match, body)
 
 
 def convert_release_to_mdx(release: dict[str, Any]) -> str:
@@ -93,22 +286,7 @@ def convert_release_to_mdx(release: dict[str, Any]) -> str:
     Returns:
         MDX formatted string
     """
-    tag_name = release.get('tag_name', 'Unknown')
-    name = release.get('name', tag_name)
-    published_at = release.get('published_at', '')
-    author = release.get('author', {}).get('login', 'Unknown')
-    html_url = release.get('html_url', '')
-    body = release.get('body', '').strip()
-
-    # Parse date
-    if published_at:
-        try:
-            date_obj = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-            formatted_date = date_obj.strftime('%B %d, %Y')
-        except Exception:
-            formatted_date = published_at
-    else:
-        formatted_date = 'Unknown date'
+    tag_name, name, formatted_date, author, html_url, body = _release_fields(release)
 
     # Build MDX content
     mdx_content = f"""---
@@ -130,13 +308,18 @@ description: "Released {formatted_date}"
     return mdx_content
 
 
-def generate_changelog_to_dir(output_dir: Path, repo: str = "pixeltable/pixeltable") -> None:
+def generate_changelog_to_dir(
+    output_dir: Path, repo: str = "pixeltable/pixeltable", work_dir: Path | None = None
+) -> None:
     """
     Generate consolidated changelog MDX file from GitHub releases.
 
     Args:
         output_dir: Where to output the .mdx file
         repo: GitHub repository in format 'owner/repo'
+        work_dir: Directory for temporary files (defaults to the parent of `output_dir`); must be on the same
+            filesystem as `output_dir`, and should be outside any tree that is published, so that leftovers
+            of an interrupted run are never deployed
     """
     print("   Fetching releases from GitHub ...")
     print(f"      Repository: {repo}")
@@ -154,84 +337,35 @@ def generate_changelog_to_dir(output_dir: Path, repo: str = "pixeltable/pixeltab
 
     print(f"   Found {len(releases)} release(s)")
 
-    # Clean output directory
-    if output_dir.exists():
-        print(f"   Cleaning output directory: {output_dir}")
-        import shutil
-        shutil.rmtree(output_dir)
-    output_dir.mkdir(parents=True)
+    # Write into a staging directory that then replaces the output directory, so that the output directory is
+    # never seen empty or partially written
+    staging_dir = (work_dir or output_dir.parent) / f'.{output_dir.name}.new'
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)  # Left over from an interrupted run
+    staging_dir.mkdir(parents=True)
 
     # Create consolidated changelog
     print(f"   Creating consolidated changelog ...")
-    changelog_content = """---
-title: "Changelog"
-description: "Release history and updates for Pixeltable"
----
-
-## Contributors
-
-Pixeltable is built by a vibrant community of contributors. We're grateful for everyone who has helped make Pixeltable better!
-
-**Want to contribute?** Check out our [Contributing Guide](https://github.com/pixeltable/pixeltable/blob/main/CONTRIBUTING.md) to get started.
-
-**Top Contributors:** View our amazing contributors on [GitHub](https://github.com/pixeltable/pixeltable/graphs/contributors).
-
----
-
-## Release History
-
-View the complete release history for Pixeltable below. Each release includes detailed information about new features, bug fixes, and improvements.
-
-For the latest release information, visit our [GitHub Releases page](https://github.com/pixeltable/pixeltable/releases).
-
----
-
-"""
+    parts: list[bytes] = [CHANGELOG_HEADER]
 
     # Add all releases inline
     for release in releases:
-        tag_name = release.get('tag_name', 'unknown')
-        name = release.get('name', tag_name)
-        published_at = release.get('published_at', '')
-        author = release.get('author', {}).get('login', 'Unknown')
-        html_url = release.get('html_url', '')
-        body = release.get('body', '').strip()
-
-        # Parse date
-        if published_at:
-            try:
-                date_obj = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                formatted_date = date_obj.strftime('%B %d, %Y')
-            except Exception:
-                formatted_date = published_at
-        else:
-            formatted_date = 'Unknown date'
+        tag_name, name, formatted_date, author, html_url, body = _release_fields(release)
 
         # Add release section (using ### to nest under "Release History")
-        changelog_content += f"### {name}\n\n"
-        changelog_content += f"**Released:** {formatted_date}  \n"
-        changelog_content += f"**Author:** [@{author}](https://github.com/{author})  \n"
-        changelog_content += f"**View on GitHub:** [{tag_name}]({html_url})\n\n"
-
-        # Convert H2 sections to H4 in the body for proper sidebar hierarchy
-        # GitHub release notes use ## for "What's Changed" and "New Contributors"
-        # Handle both mid-body (after newline) and start-of-body cases
-        body_formatted = body.replace('\n## ', '\n#### ')
-        if body_formatted.startswith('## '):
-            body_formatted = '#### ' + body_formatted[3:]
-
-        # Linkify @username mentions to GitHub profiles
-        body_formatted = linkify_github_mentions(body_formatted)
-
-        # Shorten PR links to just show #number as clickable links
-        body_formatted = shorten_pr_links(body_formatted)
-
-        changelog_content += f"{body_formatted}\n\n"
-        changelog_content += "---\n\n"
+        release_header = (
+            f"### {name}\n\n"
+            f"**Released:** {formatted_date}  \n"
+            f"**Author:** [@{author}](https://github.com/{author})  \n"
+            f"**View on GitHub:** [{tag_name}]({html_url})\n\n"
+        )
+        body_formatted = format_release_body(body)
+        parts.extend((release_header.encode('utf-8'), body_formatted.encode('utf-8'), RELEASE_SEPARATOR))
 
     # Write consolidated changelog
-    changelog_path = output_dir / 'changelog.mdx'
-    changelog_path.write_text(changelog_content)
+    changelog_path = staging_dir / 'changelog.mdx'
+    changelog_path.write_bytes(b''.join(parts))
+    replace_dir(staging_dir, output_dir, work_dir)
 
     print(f"   Changelog generated successfully.")
 
@@ -4,6 +4,7 @@ Shared configuration for doctools.
 This module provides centralized path configuration for all doctools scripts.
 """
 
+import os
 from pathlib import Path
 
 # Source directory for Mintlify documentation
@@ -33,3 +34,14 @@ def get_mintlify_target_path(repo_root: Path) -> Path:
         Path to target/docs/ directory
     """
     return repo_root / 'target' / 'docs'
+
+
+def get_cache_dir() -> Path:
+    """Get the per-user cache directory for doctools.
+
+    Honors `XDG_CACHE_HOME` if set.
+
+    Returns:
+        Path to the doctools cache directory (e.g. ~/.cache/pixeltable-doctools/)
+    """
+    return Path(os.environ.get('XDG_CACHE_HOME', '~/.cache')).expanduser() / 'pixeltable-doctools'
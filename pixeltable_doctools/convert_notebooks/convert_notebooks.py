@@ -10,18 +10,35 @@ This script:
 """
 
 import argparse
+from functools import lru_cache
 from glob import glob
+import hashlib
 import html
+import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
 import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable
 
-from pixeltable_doctools.config import get_mintlify_source_path
+from pixeltable_doctools.config import get_cache_dir, get_mintlify_source_path
+from pixeltable_doctools.fileutils import copy_item, iter_files, remove_tree, replace_dir
 from pixeltable_doctools.mintlifier.utils import img_link
 
+# Frontmatter block at the very start of an MDX file, and the title within it. Frontmatter is short, so the
+# search is bounded to the start of the file rather than scanning the (possibly large) notebook output.
+FRONTMATTER_MAX_LEN = 4096
+_FRONTMATTER_RE = re.compile(r'---\n(.*?)\n---\n', re.DOTALL)
+_TITLE_RE = re.compile(r'^title:\s*(.+)$', re.MULTILINE)
+
+# Cached notebook outputs that have not been used for this many seconds are deleted
+NOTEBOOK_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
 
 def convert_notebooks() -> None:
     """Convert all notebooks to MDX format (convenience function for CLI)."""
@@ -65,7 +82,15 @@ def preprocess_notebook(input_path: Path, output_path: Path) -> None:
     output_path.write_text(content, encoding='utf-8')
 
 
-def postprocess_mdx(mdx_file: Path, notebooks_dir: Path) -> None:
+def index_notebooks(notebooks: Iterable[Path]) -> dict[str, Path]:
+    """Map notebook stems to notebook paths; if several notebooks share a stem, the first one is kept."""
+    nb_index: dict[str, Path] = {}
+    for notebook in notebooks:
+        nb_index.setdefault(notebook.stem, notebook)
+    return nb_index
+
+
+def postprocess_mdx(mdx_file: Path, notebooks_dir: Path, nb_index: dict[str, Path] | None = None) -> None:
     """
     Post-process MDX file to enhance frontmatter with links.
 
@@ -75,33 +100,47 @@ def postprocess_mdx(mdx_file: Path, notebooks_dir: Path) -> None:
     Args:
         mdx_file: Path to the .mdx file
         notebooks_dir: Original notebooks directory (for calculating relative path)
+        nb_index: Notebooks in `notebooks_dir` by stem (see `index_notebooks()`); saves searching
+            `notebooks_dir` for every file
     """
-    content = mdx_file.read_text()
-
+    # Read and rewrite the file through a single handle
+    with open(mdx_file, 'r+', encoding='utf-8') as fp:
+        content = _postprocess_mdx_content(fp.read(), mdx_file, notebooks_dir, nb_index)
+        if content is not None:
+            fp.seek(0)
+            fp.write(content)
+            fp.truncate()
+
+
+def _postprocess_mdx_content(
+    content: str, mdx_file: Path, notebooks_dir: Path, nb_index: dict[str, Path] | None
+) -> str | None:
+    """Return the post-processed contents of `mdx_file`, or None if it should be left unchanged."""
     # Extract existing frontmatter
-    frontmatter_match = re.match(r'^---\n(.*?)\n---\n', content, re.DOTALL)
+    frontmatter_match = _FRONTMATTER_RE.match(content, 0, FRONTMATTER_MAX_LEN)
     if not frontmatter_match:
         print(f"⚠️  No frontmatter found in {mdx_file.name}, skipping")
-        return
+        return None
 
     existing_frontmatter = frontmatter_match.group(1)
     content_after_frontmatter = content[frontmatter_match.end():]
 
     # Extract title from existing frontmatter
-    title_match = re.search(r'^title:\s*(.+)$', existing_frontmatter, re.MULTILINE)
+    title_match = _TITLE_RE.search(existing_frontmatter)
     if not title_match:
         print(f"⚠️  No title in frontmatter for {mdx_file.name}, skipping")
-        return
+        return None
 
     title = title_match.group(1).strip().strip('"')
 
     # Try to find matching notebook in notebooks_dir
-    matching_notebooks = list(notebooks_dir.rglob(f'{mdx_file.stem}.ipynb'))
-    if not matching_notebooks:
+    if nb_index is None:
+        nb_index = index_notebooks(notebooks_dir.rglob('*.ipynb'))
+    original_notebook = nb_index.get(mdx_file.stem)
+    if original_notebook is None:
         print(f"⚠️  Could not find original notebook for {mdx_file.name}")
-        return
+        return None
 
-    original_notebook = matching_notebooks[0]
     # Get path relative to repo root (not just docs/)
     repo_root = notebooks_dir.parent.parent  # notebooks_dir is repo/docs/notebooks, so parent.parent is repo
     notebook_rel_path = original_notebook.relative_to(repo_root)
@@ -189,24 +228,149 @@ def postprocess_mdx(mdx_file: Path, notebooks_dir: Path) -> None:
     # Fix margins for HTML output cells
     content_after_frontmatter = content_after_frontmatter.replace('dangerouslySetInnerHTML', "style={{ 'margin': '0px 20px 0px 20px' }} dangerouslySetInnerHTML")
 
-    # Write back with enhanced frontmatter
-    mdx_file.write_text(enhanced_frontmatter + content_after_frontmatter, encoding='utf-8')
+    # Combine with enhanced frontmatter
+    return enhanced_frontmatter + content_after_frontmatter
+
+
+@lru_cache(maxsize=1)
+def _converter_fingerprint() -> bytes:
+    """Digest of the conversion code and Quarto configuration, which affect the output for every notebook."""
+    h = hashlib.blake2b(digest_size=16)
+    module_dir = Path(__file__).parent
+    for name in ('convert_notebooks.py', '_quarto.yml'):
+        h.update((module_dir / name).read_bytes())
+    return h.digest()
+
+
+def _notebook_cache_key(notebook: Path, relpath: Path) -> str:
+    """
+    Return the key under which the converted output of a notebook is cached.
+
+    The key covers the notebook's contents, its location (which determines the generated links), and the
+    converter itself, so touching a notebook without changing it (e.g. by switching branches) is a cache hit.
+    """
+    h = hashlib.blake2b(notebook.read_bytes(), digest_size=16)
+    h.update(relpath.as_posix().encode('utf-8'))
+    h.update(_converter_fingerprint())
+    return h.hexdigest()
+
+
+def _converted_outputs(output_dir: Path, relpath: Path) -> list[Path]:
+    """List the files Quarto produces for the notebook at `relpath`: the .mdx file and its directory of figures."""
+    output_path = output_dir / relpath.with_suffix('.mdx')
+    files_dir = output_path.with_name(f'{relpath.stem}_files')
+    return [path for path in (output_path, files_dir) if path.exists()]
+
+
+def _store_converted_notebook(cache_dir: Path, key: str, output_dir: Path, relpath: Path) -> None:
+    """Save the converted output of a notebook in the cache."""
+    staging_dir = Path(tempfile.mkdtemp(prefix=f'.{key}.', dir=cache_dir))
+    try:
+        for path in _converted_outputs(output_dir, relpath):
+            copy_item(path, staging_dir / path.name)
+        replace_dir(staging_dir, cache_dir / key)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
 
+def _restore_converted_notebook(entry_dir: Path, output_path: Path) -> bool:
+    """
+    Copy a notebook's cached output next to `output_path`.
 
+    Returns:
+        False if there is no cache entry at `entry_dir`.
+    """
+    try:
+        with os.scandir(entry_dir) as it:
+            cached_entries = list(it)
+    except FileNotFoundError:
+        return False
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    for entry in cached_entries:
+        copy_item(entry, output_path.parent / entry.name)
+    os.utime(output_path)  # Mark as newer than the notebook
+    os.utime(entry_dir)  # Mark the cache entry as recently used
+    return True
+
+
+def _is_stale(notebook: Path, output_path: Path) -> bool:
+    """Whether the converted output of `notebook` is missing or older than the notebook."""
+    try:
+        return notebook.stat().st_mtime > output_path.stat().st_mtime
+    except FileNotFoundError:
+        return True
+
+
+def _render_with_quarto(preprocess_dir: Path, notebooks_to_convert: list[Path], output_dir: Path) -> None:
+    """Render the preprocessed notebooks in `notebooks_to_convert` to Markdown in `output_dir`."""
+    from pixeltable_doctools.convert_notebooks import convert_notebooks
+
+    print(f"   Preparing Quarto configuration ...")
+    quarto_cfg_path = Path(convert_notebooks.__file__).parent / '_quarto.yml'
+    quarto_cfg_dest = preprocess_dir / '_quarto.yml'
+    # Only copy the configuration if it changed, so that its mtime is stable across builds
+    if not quarto_cfg_dest.exists() or quarto_cfg_dest.read_bytes() != quarto_cfg_path.read_bytes():
+        shutil.copy2(quarto_cfg_path, quarto_cfg_dest)
+
+    print(f"   Running Quarto to convert notebooks ...")
+    print(f"      Source: {preprocess_dir}")
+    print(f"      Output: {output_dir}")
+
+    try:
+        # Run quarto render on just the notebooks that need conversion, as paths relative to the project
+        # directory; this also keeps the command line short when many notebooks have changed
+        relpaths = [str(f.relative_to(preprocess_dir)) for f in notebooks_to_convert]
+        subprocess.run(
+            ['quarto', 'render', *relpaths, '--quiet', '--to', 'docusaurus-md', '--output-dir', str(output_dir)],
+            cwd=str(preprocess_dir),
+            check=True,
+            timeout=300  # 5 minute timeout
+        )
+
+    except subprocess.TimeoutExpired:
+        print("❌ Quarto did not finish within 5 minutes", file=sys.stderr)
+        raise
+    except subprocess.CalledProcessError as e:
+        # Quarto's output is not captured (it goes straight to the console as it is produced), so there is
+        # nothing more to show here than the exit status
+        print(f"❌ Quarto failed with exit status {e.returncode}", file=sys.stderr)
+        raise
+
+
+def _evict_stale_notebooks(cache_dir: Path) -> None:
+    """
+    Delete cached notebook outputs that have not been used for `NOTEBOOK_CACHE_MAX_AGE` seconds.
+
+    The cache is shared by all checkouts (and branches) of the repo, so entries are evicted by age rather than by
+    whether the current tree uses them. An entry's mtime is refreshed whenever it is stored or restored.
+    """
+    cutoff = time.time() - NOTEBOOK_CACHE_MAX_AGE
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            # Names starting with '.' are staging directories, possibly of a concurrent build
+            if not entry.name.startswith('.') and entry.stat().st_mtime < cutoff:
+                remove_tree(entry.path, ignore_errors=True)
+
+
+@lru_cache(maxsize=1)
 def find_pixeltable_repo() -> Path:
-    """Find the pixeltable repository root."""
-    cwd = Path.cwd()
+    """
+    Find the pixeltable repository root.
 
-    # Check if we're already in pixeltable repo
-    if (cwd / 'docs' / 'notebooks').exists():
-        return cwd
+    The `PIXELTABLE_REPO` environment variable, if set, takes precedence over searching upward from the
+    current directory. The result is cached for the life of the process; call
+    `find_pixeltable_repo.cache_clear()` after changing directories.
+    """
+    env_repo = os.environ.get('PIXELTABLE_REPO')
+    if env_repo:
+        return Path(env_repo)
 
     # Walk up to find it
-    current = cwd
-    for _ in range(5):  # Don't go up more than 5 levels
-        if (current / 'docs' / 'notebooks').exists():
-            return current
-        current = current.parent
+    cwd = Path.cwd()
+    for candidate in (cwd, *cwd.parents[:4]):  # Check at most 5 levels
+        if (candidate / 'docs' / 'notebooks').is_dir():
+            return candidate
 
     raise FileNotFoundError(
         "Could not find pixeltable repository. "
@@ -222,8 +386,6 @@ def convert_notebooks_to_dir(repo_root: Path, target_dir: Path) -> None:
         repo_root: Path to pixeltable repository root
         output_dir: Where to output the converted .mdx files
     """
-    from pixeltable_doctools.convert_notebooks import convert_notebooks
-
     print("   Converting Jupyter notebooks to Mintlify MDX format...")
     print(f"      Repository: {repo_root}")
     print(f"      Output: {target_dir}")
@@ -232,10 +394,6 @@ def convert_notebooks_to_dir(repo_root: Path, target_dir: Path) -> None:
     preprocess_dir = target_dir / 'pre-docs' / 'notebooks'
     output_dir = target_dir / 'docs' / 'notebooks'
 
-    # Check for quarto
-    if not shutil.which('quarto'):
-        raise RuntimeError("Quarto is not installed.")
-
     # Verify source exists
     if not notebooks_dir.exists():
         raise FileNotFoundError(f"Notebooks directory not found: {notebooks_dir}")
@@ -247,54 +405,61 @@ def convert_notebooks_to_dir(repo_root: Path, target_dir: Path) -> None:
 
     print(f"   {len(notebooks)} total notebook(s).")
 
+    # Converted notebooks are cached by content, so that notebooks whose contents have been converted before
+    # are restored rather than rerendered by Quarto
+    cache_dir = get_cache_dir() / 'notebooks'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
     print(f"   Preparing notebooks ...")
     notebooks_to_convert: list[Path] = []
+    cache_keys: dict[Path, str] = {}
+    restored_count = 0
     for notebook in notebooks:
         relpath = notebook.relative_to(notebooks_dir)
         output_path = output_dir / relpath.with_suffix('.mdx')
-        if not output_path.exists() or notebook.stat().st_mtime > output_path.stat().st_mtime:
+        if _is_stale(notebook, output_path):
+            key = _notebook_cache_key(notebook, relpath)
+            if _restore_converted_notebook(cache_dir / key, output_path):
+                restored_count += 1
+                continue
             pre_path = preprocess_dir / relpath
             pre_path.parent.mkdir(parents=True, exist_ok=True)
             preprocess_notebook(notebook, pre_path)
             notebooks_to_convert.append(pre_path)
+            cache_keys[pre_path] = key
 
-    print(f"   {len(notebooks_to_convert)} notebook(s) need conversion.")
+    _evict_stale_notebooks(cache_dir)
 
+    if restored_count > 0:
+        print(f"   {restored_count} unchanged notebook(s) restored from cache.")
     if not notebooks_to_convert:
+        print("   All notebooks are up to date.")
         return
 
-    print(f"   Preparing Quarto configuration ...")
-    quarto_cfg_path = Path(convert_notebooks.__file__).parent / '_quarto.yml'
-    shutil.copy2(quarto_cfg_path, preprocess_dir / '_quarto.yml')
-
-    print(f"   Running Quarto to convert notebooks ...")
-    print(f"      Source: {preprocess_dir}")
-    print(f"      Output: {output_dir}")
+    print(f"   {len(notebooks_to_convert)} notebook(s) need conversion.")
 
-    try:
-        # Run quarto render
-        subprocess.run(
-            ['quarto', 'render', *[str(f) for f in notebooks_to_convert], '--quiet', '--to', 'docusaurus-md', '--output-dir', str(output_dir)],
-            cwd=str(preprocess_dir),
-            check=True,
-            timeout=300  # 5 minute timeout
-        )
+    # Check for quarto; it is only needed if something needs to be rendered
+    if not shutil.which('quarto'):
+        raise RuntimeError("Quarto is not installed.")
 
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
-        print(e.stdout, file=sys.stderr)
-        print(e.stderr, file=sys.stderr)
-        raise
+    _render_with_quarto(preprocess_dir, notebooks_to_convert, output_dir)
 
     # Count converted files
-    mdx_files = list(output_dir.rglob('*.mdx'))
-    print(f"   Successfully converted {len(mdx_files)} notebook(s) to MDX")
+    mdx_count = sum(1 for _ in iter_files(output_dir, '.mdx'))
+    print(f"   Successfully converted {mdx_count} notebook(s) to MDX")
 
     # Post-process: Add frontmatter to each MDX file
     print(f"   Postprocessing MDX files ...")
-    for notebook in notebooks_to_convert:
+    nb_index = index_notebooks(notebooks)
+
+    def postprocess(notebook: Path) -> None:
         relpath = notebook.relative_to(preprocess_dir)
         mdx_file = output_dir / relpath.with_suffix('.mdx')
-        postprocess_mdx(mdx_file, notebooks_dir)
+        postprocess_mdx(mdx_file, notebooks_dir, nb_index)
+        _store_converted_notebook(cache_dir, cache_keys[notebook], output_dir, relpath)
+
+    with ThreadPoolExecutor(max_workers=min(32, len(notebooks_to_convert))) as executor:
+        list(executor.map(postprocess, notebooks_to_convert))
     print(f"   Updated frontmatter for {len(notebooks_to_convert)} file(s)")
 
 
@@ -3,20 +3,39 @@
 Deploy documentation.
 """
 
-from copy import deepcopy
-import json
+from contextlib import contextmanager
+import os
 import shutil
 import subprocess
 import sys
-import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from time import sleep
-from typing import Any
+from typing import Any, Iterator
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False  # Windows; concurrent deploys are not serialized
 
 from pixeltable_doctools.build import validate_mintlify_docs
+from pixeltable_doctools.build_cache import hash_inputs
+from pixeltable_doctools.config import get_cache_dir
+from pixeltable_doctools.fileutils import iter_files, read_json, remove_tree, sync_tree, write_json
 from pixeltable_doctools.mintlifier.docsjson_updater import DocsJsonUpdater
 
+DOCS_REPO_URL = 'https://github.com/pixeltable/pixeltable-docs-www.git'
+
+# Digest of the generated docs that a deploy was made from, committed to the docs repo
+DEPLOY_DIGEST_FILE = '.deploy-digest'
+
+# Abort a push that transfers less than GIT_HTTP_LOW_SPEED_LIMIT bytes/s for GIT_HTTP_LOW_SPEED_TIME seconds,
+# rather than letting it hang on a stalled connection
+GIT_PUSH_ENV = {'GIT_HTTP_LOW_SPEED_LIMIT': '1000', 'GIT_HTTP_LOW_SPEED_TIME': '30'}
+
 
 def find_sdk_tab(docs: dict[str, Any]) -> dict[str, Any]:
     if 'navigation' in docs and 'tabs' in docs['navigation']:
@@ -26,54 +45,243 @@ def find_sdk_tab(docs: dict[str, Any]) -> dict[str, Any]:
     return None
 
 
-def merge_sdk_dropdowns(existing: dict, new: dict) -> None:
+def merge_sdk_dropdowns(existing_dropdowns: list[dict], new: dict) -> None:
     """
-    Merge dropdowns from the existing navigation structure into the new one; prefer the new
+    Merge the existing SDK version dropdowns into the new navigation structure; prefer the new
     one when there is a conflict.
     """
-    # Find SDK tab in each version
-    existing_sdk_tab = find_sdk_tab(existing)
     new_sdk_tab = find_sdk_tab(new)
 
     # Merge version dropdowns from production into generated
-    existing_dropdowns: list[dict] = existing_sdk_tab.get('dropdowns', [])
     new_dropdowns: list[dict] = new_sdk_tab.get('dropdowns', [])
 
+    # Seed with the new dropdowns, so that they take precedence; existing ones are kept as archived versions
+    merged_dropdowns = {dropdown['dropdown']: dropdown for dropdown in new_dropdowns}
     for dropdown in existing_dropdowns:
-        dropdown['icon'] = 'archive'
-
-    merged_dropdowns = {dropdown['dropdown']: dropdown for dropdown in existing_dropdowns}
-    merged_dropdowns.update({dropdown['dropdown']: dropdown for dropdown in new_dropdowns})
+        if merged_dropdowns.setdefault(dropdown['dropdown'], dropdown) is dropdown:
+            dropdown['icon'] = 'archive'
 
     new_sdk_tab['dropdowns'] = DocsJsonUpdater.sort_dropdowns(merged_dropdowns.values())
 
 
-def replace_paths(group: dict[str, Any], old: str, new: str) -> None:
-    pages = group['pages']
-    for i in range(len(pages)):
-        page = pages[i]
-        if isinstance(page, dict):
-            replace_paths(page, old, new)
+def copy_with_paths(group: dict[str, Any], old: str, new: str) -> dict[str, Any]:
+    """
+    Return a copy of a navigation group in which `old` is replaced with `new` in all page paths, including those
+    of nested groups.
+
+    Only the groups and their `pages` lists are copied; all other values of a group are scalars and are shared
+    with the original. Nested groups are walked with an explicit stack rather than recursively.
+    """
+    root = {**group, 'pages': list(group['pages'])}
+    stack = [root]
+    while stack:
+        pages = stack.pop()['pages']
+        for i, page in enumerate(pages):
+            if isinstance(page, str):
+                if old in page:
+                    pages[i] = page.replace(old, new)
+            else:
+                pages[i] = {**page, 'pages': list(page['pages'])}
+                stack.append(pages[i])
+    return root
+
+
+def head_sha(repo_dir: Path) -> str:
+    """
+    Return the commit sha of HEAD in `repo_dir`.
+
+    The sha is read directly from the repo's `HEAD` and refs files, which avoids spawning `git`. Falls back to
+    `git rev-parse` for layouts not handled here (e.g. worktrees, where `.git` is a file).
+    """
+    git_dir = repo_dir / '.git'
+    try:
+        head = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+        if not head.startswith('ref: '):
+            return head  # Detached HEAD
+        ref = head[len('ref: '):]
+        ref_path = git_dir / ref
+        if ref_path.is_file():
+            return ref_path.read_text(encoding='utf-8').strip()
+        with open(git_dir / 'packed-refs', 'r', encoding='utf-8') as fp:
+            for line in fp:
+                sha, _, name = line.rstrip('\n').partition(' ')
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+
+    result = subprocess.run(
+        ('git', 'rev-parse', 'HEAD'),
+        cwd=str(repo_dir),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip()
+
+
+@contextmanager
+def _file_lock(lock_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on `lock_path` for the duration of the context (a no-op without `fcntl`)."""
+    with open(lock_path, 'w') as lock_fp:
+        if HAS_FCNTL:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+        yield
+
+
+def _git(*args: str, cwd: Path) -> None:
+    subprocess.run(
+        ('git', *args), cwd=str(cwd), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+
+
+def _git_push(refspec: str, cwd: Path) -> None:
+    """Push a single ref to the docs repo atomically, failing promptly if the connection stalls."""
+    subprocess.run(
+        ('git', 'push', '--atomic', 'origin', refspec),
+        cwd=str(cwd),
+        env={**os.environ, **GIT_PUSH_ENV},
+        check=True
+    )
+
+
+def _git_output(*args: str, cwd: Path) -> str:
+    """Return the stripped stdout of a git command, or '' if it fails."""
+    result = subprocess.run(('git', *args), cwd=str(cwd), capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else ''
+
+
+def fetch_docs_branch(branch: str) -> Path:
+    """
+    Fetch the tip of `branch` of the docs repo into the shared bare clone under the doctools cache dir.
+
+    All branches share a single bare, shallow, partial clone, so each fetch only downloads what has changed since
+    any branch was last fetched, and blobs common to several branches are stored once. The fetched tip is
+    available as `refs/remotes/origin/<branch>`.
+
+    Args:
+        branch: Branch of the docs repo to fetch
+
+    Returns:
+        Path to the bare clone
+    """
+    cache_dir = get_cache_dir() / 'pixeltable-docs-www'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    bare_repo_dir = cache_dir / 'repo.git'
+
+    with _file_lock(cache_dir / 'repo.lock'):
+        if not bare_repo_dir.is_dir():
+            # Set up the clone under a temporary name, so that an interrupted setup is never mistaken for a clone
+            print(f"   Creating {bare_repo_dir} ...")
+            new_repo_dir = cache_dir / 'repo.git.new'
+            if new_repo_dir.exists():
+                shutil.rmtree(new_repo_dir)
+            _git('init', '--bare', '-q', str(new_repo_dir), cwd=cache_dir)
+            _git('remote', 'add', 'origin', DOCS_REPO_URL, cwd=new_repo_dir)
+            _git('config', 'remote.origin.promisor', 'true', cwd=new_repo_dir)
+            _git('config', 'remote.origin.partialclonefilter', 'blob:none', cwd=new_repo_dir)
+            os.replace(new_repo_dir, bare_repo_dir)
+
+        # A fetch negotiates with the remote and writes a new shallow pack even when nothing has changed; if the
+        # branch tip is still the one fetched (or pushed) last time, a single ref lookup suffices
+        remote_ref = f'refs/remotes/origin/{branch}'
+        local_sha = _git_output('rev-parse', '--verify', '-q', remote_ref, cwd=bare_repo_dir)
+        remote_sha = _git_output('ls-remote', 'origin', f'refs/heads/{branch}', cwd=bare_repo_dir).partition('\t')[0]
+        if local_sha and local_sha == remote_sha:
+            print(f"   {branch!r} branch is up to date")
+            return bare_repo_dir
+
+        # We only ever commit on top of the branch tip, so its history is not needed
+        print(f"   Fetching {branch!r} branch ...")
+        _git('fetch', '--depth=1', '--filter=blob:none', 'origin', f'+refs/heads/{branch}:{remote_ref}', cwd=bare_repo_dir)
+
+    return bare_repo_dir
+
+
+@contextmanager
+def docs_repo_checkout(branch: str) -> Iterator[Path]:
+    """
+    Check out the tip of `branch` of the docs repo in a persistent worktree under the doctools cache dir.
+
+    The worktree is reused across deploys: it is hard-reset to the freshly fetched remote branch (discarding
+    anything left over from a previous deploy) instead of being re-cloned from scratch. HEAD is detached, so
+    commits made in the checkout are pushed with `git push origin HEAD:<branch>`. The checkout is locked while
+    in use, so that concurrent deploys to the same branch are serialized.
+
+    Args:
+        branch: Branch of the docs repo to check out
+
+    Yields:
+        Path to the checked-out docs repo
+    """
+    cache_dir = get_cache_dir() / 'pixeltable-docs-www'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    docs_repo_dir = cache_dir / branch
+
+    with _file_lock(cache_dir / f'{branch}.lock'):
+        bare_repo_dir = fetch_docs_branch(branch)
+        remote_ref = f'refs/remotes/origin/{branch}'
+        if (docs_repo_dir / '.git').is_file():
+            print(f"   Updating {docs_repo_dir} ...")
+            _git('reset', '--hard', '-q', remote_ref, cwd=docs_repo_dir)
+            _git('clean', '-ffdxq', cwd=docs_repo_dir)
         else:
-            assert isinstance(page, str)
-            pages[i] = page.replace(old, new)
+            if docs_repo_dir.exists():
+                shutil.rmtree(docs_repo_dir)  # Left over from an interrupted checkout, or a standalone clone
+            print(f"   Checking out into {docs_repo_dir} ...")
+            _git('worktree', 'prune', cwd=bare_repo_dir)
+            _git('worktree', 'add', '-q', '--detach', str(docs_repo_dir), remote_ref, cwd=bare_repo_dir)
+
+        yield docs_repo_dir
+
+
+@dataclass(frozen=True, slots=True)
+class DeployTarget:
+    """Settings for deploying generated docs to one of the docs repo branches."""
 
+    branch: str
+    # Publish under the release version (major.minor.patch) rather than the full dev version
+    release_version: bool
+    # Keep the SDK docs of earlier versions, and merge their version dropdowns into docs.json
+    keep_sdk_versions: bool
+    # Refuse to deploy docs that have parsing errors
+    strict_validation: bool
 
-def deploy(pxt_version: str, pxt_repo_dir: Path, temp_dir: Path, branch: str) -> None:
+
+DEPLOY_TARGETS = {
+    'dev': DeployTarget('dev', release_version=False, keep_sdk_versions=False, strict_validation=False),
+    'stage': DeployTarget('stage', release_version=True, keep_sdk_versions=True, strict_validation=True),
+}
+
+
+def deploy(
+    pxt_version: str,
+    pxt_repo_dir: Path,
+    docs_repo_dir: Path,
+    target: DeployTarget,
+    validation: Future[list[str]],
+) -> None:
     """
     Deploy generated docs.
 
     Args:
-        output_dir: Directory containing generated docs
+        pxt_version: Pixeltable version being deployed
+        pxt_repo_dir: Path to the pixeltable repository root
+        docs_repo_dir: Checkout of the docs repo at the tip of the target branch (see `docs_repo_checkout()`)
+        target: Deploy target
+        validation: Result of `validate_mintlify_docs()` on the generated docs, which may still be running
     """
+    branch = target.branch
     docs_target_dir = pxt_repo_dir / 'target' / 'docs'
-    if not docs_target_dir.exists():
-        print(f"Error: Docs target directory {docs_target_dir} does not exist. Please build the docs first.")
+
+    errors = validation.result()
+    if errors and target.strict_validation:
+        print(f"\nERROR: Documentation has parsing errors. Fix before deploying to {branch!r}, or deploy to 'dev' instead.")
         sys.exit(1)
 
     display_version: str
     warn_changed: bool = False
-    if branch == 'dev':
+    if not target.release_version:
         display_version = pxt_version.replace('+', '.')
     else:
         # For prod/staging deployments, truncate to major.minor.patch. We do this so that we can redeploy
@@ -85,125 +293,102 @@ def deploy(pxt_version: str, pxt_repo_dir: Path, temp_dir: Path, branch: str) ->
             display_version = pxt_version
         else:
             patch_num = int(version_split[2])
-            assert patch_num > 0
+            if patch_num == 0:
+                raise RuntimeError(f"Cannot determine the release version for {pxt_version!r}")
             display_version = '.'.join([version_split[0], version_split[1], str(patch_num - 1)])
             warn_changed = True
     display_version = f'v{display_version}'
 
     # Retrieve current sha
-    result = subprocess.run(
-        ('git', 'rev-parse', 'HEAD'),
-        cwd=str(pxt_repo_dir),
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    pxt_sha = result.stdout.strip()[:8]
+    pxt_sha = head_sha(pxt_repo_dir)[:8]
 
     print(f"\nAssembling docs {display_version} from {pxt_sha} into {branch!r} branch ...")
 
     if warn_changed:
         print(f"   NOTE: There have been changes since the official {display_version} release.")
 
-    docs_repo_dir = Path(temp_dir) / 'pixeltable-docs-www'
-
-    # Clone the docs repository
-    print(f"   Cloning into {docs_repo_dir} ...")
-    subprocess.run(
-        ('git', 'clone', '-b', branch, 'https://github.com/pixeltable/pixeltable-docs-www.git', str(docs_repo_dir)),
-        capture_output=True,
-        text=True,
-        check=True
+    # The digest of the generated docs is committed along with them; if it matches, the docs were already
+    # deployed from identical output, and copying, staging and committing can all be skipped. Paths are hashed
+    # relative to the output dir, so that the digest is the same for every checkout of pixeltable.
+    digest = hash_inputs(
+        map(Path, iter_files(docs_target_dir, skip_hidden=True)), display_version, branch, root=docs_target_dir
     )
-
-    # Load docs JSON
-    existing_docs_json: dict[str, Any] = {}
-    new_docs_json: dict[str, Any] = {}
-
-    with open(docs_repo_dir / 'docs.json', 'r', encoding='utf-8') as fp:
-        existing_docs_json = json.load(fp)
-
-    with open(docs_target_dir / 'docs.json', 'r', encoding='utf-8') as fp:
-        new_docs_json = json.load(fp)
-
-    # Clean existing repo dir
-    for item in docs_repo_dir.iterdir():
-        if item.name.startswith('.git'):
-            continue  # Skip .git directory
-        if item.name == 'sdk' and branch != 'dev':
-            continue  # Skip sdk directory for prod/stage deployments
-        if item.is_dir():
-            shutil.rmtree(item)
-        else:
-            item.unlink()
-
-    # Copy all docs from output
+    digest_path = docs_repo_dir / DEPLOY_DIGEST_FILE
+    if digest_path.is_file() and digest_path.read_text(encoding='utf-8').strip() == digest:
+        print(f"\nThere are no changes to deploy.")
+        print(f"\nView at: https://pixeltable-{branch}.mintlify.app/")
+        return
+
+    # Load docs JSON; of the existing docs, only the SDK version dropdowns are needed (and only if they are kept),
+    # so the rest is discarded right away
+    existing_dropdowns: list[dict] = []
+    if target.keep_sdk_versions:
+        existing_sdk_tab = find_sdk_tab(read_json(docs_repo_dir / 'docs.json'))
+        if existing_sdk_tab is not None:
+            existing_dropdowns = existing_sdk_tab.get('dropdowns', [])
+    new_docs_json: dict[str, Any] = read_json(docs_target_dir / 'docs.json')
+
+    # Sync docs from output into the repo, copying only changed files and deleting stale ones. Hidden entries are
+    # never published (the build does not copy any from the source, so any in the output are temporary files),
+    # and in the repo they are left alone: the .git directory, git config files and the deploy digest. sdk is
+    # handled separately.
     print(f"   Copying documentation files ...")
-    for item in docs_target_dir.iterdir():
-        if item.name == 'sdk':
-            continue  # Skip sdk directory; handled separately
-        dest = docs_repo_dir / item.name
-        assert not dest.exists()
-        if item.is_dir():
-            shutil.copytree(item, dest)
-        else:
-            shutil.copy2(item, dest)
-
-    # Copy latest SDK docs twice: as 'latest' and as versioned
-    (docs_repo_dir / 'sdk').mkdir(exist_ok=True)
-    latest_src = docs_target_dir / 'sdk' / 'latest'
-    for name in ('latest', display_version):
-        dest = docs_repo_dir / 'sdk' / name
-        print(f"   Copying latest SDK docs to: {dest}")
-        if dest.exists():
-            shutil.rmtree(dest)
-        shutil.copytree(latest_src, dest)
+    start = time.perf_counter()
+    sync_tree(docs_target_dir, docs_repo_dir, exclude=('.*', '/sdk'))
+
+    # Sync latest SDK docs twice: as 'latest' and as versioned
+    sdk_dir = docs_repo_dir / 'sdk'
+    sdk_dir.mkdir(exist_ok=True)
+    if not target.keep_sdk_versions:
+        with os.scandir(sdk_dir) as it:
+            for entry in it:
+                if entry.name in ('latest', display_version):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    remove_tree(entry.path)
+                else:
+                    os.unlink(entry.path)
+    sync_tree(docs_target_dir / 'sdk' / 'latest', sdk_dir / 'latest')
+    # The versioned copy is identical, so its files are hardlinked to those in sdk/latest rather than copied
+    sync_tree(sdk_dir / 'latest', sdk_dir / display_version, link=True)
+    print(
+        f"   Copied documentation files and SDK docs (as sdk/latest and sdk/{display_version}) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
 
     sdk_tab = find_sdk_tab(new_docs_json)
-    assert len(sdk_tab['dropdowns']) == 1 and sdk_tab['dropdowns'][0]['dropdown'] == "latest"
-    dropdown_copy = deepcopy(sdk_tab['dropdowns'][0])
-    dropdown_copy['dropdown'] = display_version
-    for group in dropdown_copy['groups']:
-        replace_paths(group, 'sdk/latest/', f'sdk/{display_version}/')
+    if len(sdk_tab['dropdowns']) != 1 or sdk_tab['dropdowns'][0]['dropdown'] != "latest":
+        raise RuntimeError("Expected the generated docs.json to have a single 'latest' SDK dropdown")
+    latest_dropdown = sdk_tab['dropdowns'][0]
+    dropdown_copy = {
+        **latest_dropdown,
+        'dropdown': display_version,
+        'groups': [
+            copy_with_paths(group, 'sdk/latest/', f'sdk/{display_version}/') for group in latest_dropdown['groups']
+        ],
+    }
     sdk_tab['dropdowns'].append(dropdown_copy)
 
     # Merge existing dropdowns if a prod/staging deployment
-    if branch != 'dev':
+    if target.keep_sdk_versions:
         print(f"   Merging SDK dropdowns in docs.json ...")
-        merge_sdk_dropdowns(existing_docs_json, new_docs_json)
-
-    with open(docs_repo_dir / 'docs.json', 'w', encoding='utf-8') as fp:
-        json.dump(new_docs_json, fp, indent=2)
+        merge_sdk_dropdowns(existing_dropdowns, new_docs_json)
 
-    errors = validate_mintlify_docs(docs_repo_dir)
-    if errors and branch != 'dev':
-        print(f"\nERROR: Documentation has parsing errors. Fix before deploying to {branch!r}, or deploy to 'dev' instead.")
-        sys.exit(1)
+    write_json(docs_repo_dir / 'docs.json', new_docs_json)
+    digest_path.write_text(digest + '\n', encoding='utf-8')
 
-    # Add changes to local repo
+    # The deploy digest always differs from the committed one at this point (otherwise we would have returned
+    # above), so there is always something to commit and no need for a separate `git status` check
+    print(f"\nCommitting changes to {branch!r} branch ...")
     subprocess.run(('git', 'add', '-A'), cwd=str(docs_repo_dir), check=True)
-    result = subprocess.run(
-        ('git', 'diff', '--staged', '--quiet'),
-        cwd=str(docs_repo_dir)
+    subprocess.run(
+        ('git', 'commit', '-m', f'Deploy documentation {display_version} from {pxt_sha}'),
+        cwd=str(docs_repo_dir),
+        check=True
     )
-
-    if result.returncode != 0:  # There are changes
-        print(f"\nCommitting changes to {branch!r} branch ...")
-        subprocess.run(
-            ('git', 'commit', '-m', f'Deploy documentation {display_version} from {pxt_sha}'),
-            cwd=str(docs_repo_dir),
-            check=True
-        )
-        print(f"\nPushing to origin ...")
-        subprocess.run(
-            ('git', 'push', 'origin', branch),
-            cwd=str(docs_repo_dir),
-            check=True
-        )
-        print(f"   Deployed successfully")
-
-    else:
-        print(f"\nThere are no changes to deploy.")
+    print(f"\nPushing to origin ...")
+    _git_push(f'HEAD:refs/heads/{branch}', docs_repo_dir)
+    print(f"   Deployed successfully")
 
     print(f"\nView at: https://pixeltable-{branch}.mintlify.app/")
 
@@ -212,116 +397,70 @@ def deploy_to_prod():
     """
     Deploy stage branch to main branch (production).
 
-    This completely replaces main with stage content, creating a commit checkpoint.
+    This completely replaces main with stage content, creating a commit checkpoint on top of main.
     """
     print(f"\n🚀 Deploying documentation from stage to production...")
     print("=" * 60)
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-
-        # Clone main branch
-        print(f"\n📥 Cloning main branch...")
-        main_repo_dir = temp_path / 'pixeltable-docs-www-main'
-        result = subprocess.run(
-            ['git', 'clone', '-b', 'main', 'https://github.com/pixeltable/pixeltable-docs-www.git', str(main_repo_dir)],
-            capture_output=True,
-            text=True
-        )
+    print(f"\n📥 Fetching main and stage branches...")
+    try:
+        fetch_docs_branch('main')
+        bare_repo_dir = fetch_docs_branch('stage')
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to fetch branches: {e.stderr}")
+        sys.exit(1)
+    print(f"   ✓ Fetched main and stage branches")
 
-        if result.returncode != 0:
-            print(f"❌ Failed to clone main branch: {result.stderr}")
-            sys.exit(1)
+    result = subprocess.run(
+        [
+            'git', 'rev-parse', 'refs/remotes/origin/main', 'refs/remotes/origin/main^{tree}',
+            'refs/remotes/origin/stage^{tree}'
+        ],
+        cwd=str(bare_repo_dir),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    main_sha, main_tree, stage_tree = result.stdout.split()
 
-        print(f"   ✓ Cloned main branch")
+    # Commit changes. The checkpoint commit has exactly stage's tree on top of main, so it is created directly
+    # in the bare repo from the tree objects that are already on the remote, without a working tree; no blobs
+    # of either branch are downloaded.
+    print(f"\n💾 Creating commit checkpoint...")
+    if main_tree != stage_tree:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        commit_message = f"Deploy from stage to production ({timestamp})"
 
-        # Clone stage branch
-        print(f"\n📥 Cloning stage branch...")
-        stage_repo_dir = temp_path / 'pixeltable-docs-www-stage'
         result = subprocess.run(
-            ['git', 'clone', '-b', 'stage', 'https://github.com/pixeltable/pixeltable-docs-www.git', str(stage_repo_dir)],
+            ['git', 'commit-tree', stage_tree, '-p', main_sha, '-m', commit_message],
+            cwd=str(bare_repo_dir),
             capture_output=True,
-            text=True
+            text=True,
+            check=True
         )
+        commit_sha = result.stdout.strip()
 
-        if result.returncode != 0:
-            print(f"❌ Failed to clone stage branch: {result.stderr}")
-            sys.exit(1)
-
-        print(f"   ✓ Cloned stage branch")
-
-        # Delete all files in main (except .git)
-        print(f"\n🗑️  Clearing main branch content...")
-        for item in main_repo_dir.iterdir():
-            if item.name == '.git':
-                continue
-            if item.is_dir():
-                shutil.rmtree(item)
-            else:
-                item.unlink()
-
-        print(f"   ✓ Cleared main branch")
-
-        # Copy all files from stage to main (except .git)
-        print(f"\n📋 Copying stage content to main...")
-        copied_count = 0
-        for item in stage_repo_dir.iterdir():
-            if item.name == '.git':
-                continue
-            dest = main_repo_dir / item.name
-            if item.is_dir():
-                shutil.copytree(item, dest)
-            else:
-                shutil.copy2(item, dest)
-            copied_count += 1
+        print(f"   ✓ Created commit: {commit_message}")
 
-        print(f"   ✓ Copied {copied_count} items")
+        # Push to main
+        print(f"\n📤 Pushing to main branch...")
+        _git_push(f'{commit_sha}:refs/heads/main', bare_repo_dir)
 
-        # Commit changes
-        print(f"\n💾 Creating commit checkpoint...")
-        subprocess.run(['git', 'add', '-A'], cwd=str(main_repo_dir), check=True)
+        print(f"   ✓ Pushed to main")
 
-        # Check if there are changes
+        # Show recent commits for rollback reference
+        print(f"\n📜 Recent commits (for rollback reference):")
         result = subprocess.run(
-            ['git', 'diff', '--staged', '--quiet'],
-            cwd=str(main_repo_dir)
+            ['git', 'log', '--oneline', '-5', commit_sha],
+            cwd=str(bare_repo_dir),
+            capture_output=True,
+            text=True
         )
+        for line in result.stdout.strip().split('\n'):
+            print(f"   {line}")
 
-        if result.returncode != 0:  # There are changes
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            commit_message = f"Deploy from stage to production ({timestamp})"
-
-            subprocess.run(
-                ['git', 'commit', '-m', commit_message],
-                cwd=str(main_repo_dir),
-                check=True
-            )
-
-            print(f"   ✓ Created commit: {commit_message}")
-
-            # Push to main
-            print(f"\n📤 Pushing to main branch...")
-            subprocess.run(
-                ['git', 'push', 'origin', 'main'],
-                cwd=str(main_repo_dir),
-                check=True
-            )
-
-            print(f"   ✓ Pushed to main")
-
-            # Show recent commits for rollback reference
-            print(f"\n📜 Recent commits (for rollback reference):")
-            result = subprocess.run(
-                ['git', 'log', '--oneline', '-5'],
-                cwd=str(main_repo_dir),
-                capture_output=True,
-                text=True
-            )
-            for line in result.stdout.strip().split('\n'):
-                print(f"   {line}")
-
-        else:
-            print(f"   ℹ️  No changes detected (stage and main are identical)")
+    else:
+        print(f"   ℹ️  No changes detected (stage and main are identical)")
 
     print("\n" + "=" * 60)
     print("✅ Production deployment complete!")
@@ -336,7 +475,7 @@ def main():
         sys.exit(1)
 
     target = sys.argv[1]
-    if target not in ('dev', 'stage', 'prod'):
+    if target not in (*DEPLOY_TARGETS, 'prod'):
         print(f"Error: Invalid target {target!r}. Must be one of: dev, stage, prod.")
         sys.exit(1)
 
@@ -358,8 +497,18 @@ def main():
     if target == 'prod':
         deploy_to_prod()
     else:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            deploy(pxt.__version__, pxt_repo_dir, temp_dir, target)
+        deploy_target = DEPLOY_TARGETS[target]
+        docs_target_dir = pxt_repo_dir / 'target' / 'docs'
+        if not docs_target_dir.exists():
+            print(f"Error: Docs target directory {docs_target_dir} does not exist. Please build the docs first.")
+            sys.exit(1)
+
+        # Validate the generated docs while the docs repo is being fetched: the deployed MDX files are exactly
+        # those in the target dir, so there is no need to wait for them to be copied into the repo first
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            validation = executor.submit(validate_mintlify_docs, docs_target_dir)
+            with docs_repo_checkout(target) as docs_repo_dir:
+                deploy(pxt.__version__, pxt_repo_dir, docs_repo_dir, deploy_target, validation)
 
 
 if __name__ == '__main__':
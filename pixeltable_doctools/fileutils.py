@@ -0,0 +1,459 @@
+"""
+Shared filesystem helpers for doctools.
+
+This module provides the directory copy routines and JSON file I/O used by the build and deploy scripts.
+"""
+
+import fnmatch
+import json
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Where a copy cannot go through the kernel (e.g. sendfile is unsupported, or on other platforms' fallback paths),
+# `shutil` copies through a userspace buffer of only 64 KiB on POSIX; a larger buffer means far fewer syscalls
+# per file. This is shared by every copy in the process, including those made with `shutil.copy2` directly.
+shutil.COPY_BUFSIZE = max(shutil.COPY_BUFSIZE, 1 << 20)
+
+# `os.copy_file_range` is only available on Linux, with Python 3.8+ and glibc 2.27+
+HAS_COPY_FILE_RANGE = hasattr(os, 'copy_file_range')
+
+# robocopy exit codes below 8 all indicate success
+ROBOCOPY_OK_RETURNCODES = range(8)
+
+# Characters that make a sync exclude pattern a glob rather than a literal name
+_GLOB_CHARS_RE = re.compile(r'[*?\[]')
+
+
+def default_jobs() -> int:
+    """Return the default number of worker threads for parallel copies."""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def fast_copytree(src: Path, dest: Path) -> None:
+    """
+    Copy the directory tree `src` to `dest`, merging into `dest` if it already exists.
+
+    Uses the platform's native copier where available, since it is far faster than `shutil.copytree` on
+    trees with many small files: `robocopy` on Windows, `cp -c` (APFS clonefile) on macOS, and
+    `cp --reflink=auto` (copy-on-write on btrfs/xfs) on Linux. Falls back to `shutil.copytree` if the
+    native tool is missing or fails; the fallback still copies each file through the kernel with `copy_file`.
+
+    Args:
+        src: Source directory
+        dest: Destination directory
+    """
+    if sys.platform == 'win32':
+        cmd = ['robocopy', str(src), str(dest), '/E', '/MT:32', '/NFL', '/NDL', '/NJH', '/NJS', '/NP']
+        ok_returncodes = ROBOCOPY_OK_RETURNCODES
+    else:
+        clone_flag = '-c' if sys.platform == 'darwin' else '--reflink=auto'
+        # Copying `src/.` (rather than `src`) merges the contents into an existing `dest`
+        cmd = ['cp', '-a', clone_flag, f'{src}{os.sep}.', str(dest)]
+        ok_returncodes = range(1)
+
+    dest.mkdir(parents=True, exist_ok=True)
+    if _run_native(cmd, ok_returncodes):
+        return
+
+    shutil.copytree(src, dest, dirs_exist_ok=True, copy_function=copy_file)
+
+
+def _run_native(cmd: list[str], ok_returncodes: range) -> bool:
+    """
+    Run a native copy tool, and return True if it is installed and succeeded.
+
+    Only the exit code matters, so the tool's output is discarded; robocopy in particular reports every file it
+    copies.
+    """
+    if not shutil.which(cmd[0]):
+        return False
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode in ok_returncodes
+
+
+def iter_files(root: Path, suffix: str = '', skip_hidden: bool = False) -> Iterator[str]:
+    """
+    Yield the paths of all files under `root` whose names end with `suffix`.
+
+    Unlike `Path.rglob` followed by `is_file()`, this needs no `stat` call per entry: the file types come from
+    `os.scandir`, which gets them along with the directory listing. With `skip_hidden`, files and directories
+    whose names start with '.' are skipped.
+    """
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if skip_hidden and entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(suffix):
+                    yield entry.path
+
+
+def copy_file(src: str | os.PathLike, dest: str | os.PathLike, src_stat: os.stat_result | None = None) -> None:
+    """
+    Copy a file's contents, permission bits, and timestamps, like `shutil.copy2`.
+
+    `shutil.copy2` stats the source several times per file; passing the cached `DirEntry.stat()` result of a
+    directory scan as `src_stat` avoids those extra syscalls.
+
+    Args:
+        src: Source file
+        dest: Destination file
+        src_stat: Stat result of `src`, if already known
+    """
+    if src_stat is None:
+        src_stat = os.stat(src)
+    _copy_contents(src, dest, src_stat.st_size)
+    os.chmod(dest, stat.S_IMODE(src_stat.st_mode))
+    os.utime(dest, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def link_file(src: str | os.PathLike, dest: str | os.PathLike, src_stat: os.stat_result | None = None) -> None:
+    """
+    Hardlink `src` to `dest`, replacing any existing `dest`, so that no file data is copied at all.
+
+    Falls back to `copy_file` where hardlinks are not possible (e.g. across filesystems). Only suitable when
+    neither side is later modified in place, since both names then share the same file.
+
+    Args:
+        src: Source file
+        dest: Destination file
+        src_stat: Stat result of `src`, if already known
+    """
+    Path(dest).unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        copy_file(src, dest, src_stat)
+
+
+def _copy_file_range(src_fd: int, dest_fd: int, size: int) -> int:
+    """
+    Copy as much of a file as possible with `copy_file_range`, and return the number of bytes copied.
+
+    Stops early if `copy_file_range` is not supported for this pair of files. On return, the file position of
+    `dest_fd` is at the end of the copied data.
+    """
+    offset = 0
+    try:
+        while offset < size:
+            copied = os.copy_file_range(src_fd, dest_fd, size - offset, offset, offset)
+            if copied == 0:
+                break
+            offset += copied
+    except OSError:
+        pass  # Not supported for this pair of files; the caller copies the rest
+    # copy_file_range was given explicit offsets and left the file position at 0
+    os.lseek(dest_fd, offset, os.SEEK_SET)
+    return offset
+
+
+def _copy_contents(src: str | os.PathLike, dest: str | os.PathLike, size: int) -> None:
+    """
+    Copy a file's contents using the kernel's copy path, without staging the data in userspace.
+
+    On Linux this is a `copy_file_range` loop, which lets the filesystem share extents (btrfs, xfs) or copy
+    server-side (NFS, SMB); where that is unsupported (e.g. across filesystems on older kernels), the remainder is
+    copied with `sendfile`. The size is already known, so no extra `fstat` is needed. On Windows this uses
+    `CopyFileExW`. Elsewhere (including macOS, where it uses `fcopyfile`) this defers to `shutil.copyfile`.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+
+        if not ctypes.windll.kernel32.CopyFileExW(os.fspath(src), os.fspath(dest), None, None, None, 0):
+            raise ctypes.WinError()
+        return
+
+    if sys.platform.startswith('linux'):
+        try:
+            with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                offset = _copy_file_range(fsrc.fileno(), fdst.fileno(), size) if HAS_COPY_FILE_RANGE else 0
+                while offset < size:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            return
+        except OSError:
+            pass  # Filesystem does not support sendfile; fall back to a regular copy
+
+    shutil.copyfile(src, dest)
+
+
+def copy_item(item: Path | os.DirEntry, dest: Path) -> None:
+    """Copy a single file or directory tree to `dest`; passing a `DirEntry` reuses its cached stat info."""
+    if item.is_dir():
+        fast_copytree(Path(item), dest)
+    else:
+        copy_file(item, dest, item.stat() if isinstance(item, os.DirEntry) else None)
+
+
+def remove_tree(path: str | os.PathLike, ignore_errors: bool = False, jobs: int | None = None) -> None:
+    """
+    Delete a directory tree, like `shutil.rmtree`, but unlink the files of different directories in parallel.
+
+    Deleting a docs tree is dominated by per-file `unlink` latency, which overlaps well across threads. The tree
+    is walked once with `os.scandir`; the directories themselves are removed afterwards, deepest first.
+
+    Args:
+        path: Directory to delete
+        ignore_errors: Ignore errors, leaving behind whatever could not be deleted
+        jobs: Number of worker threads (defaults to `default_jobs()`)
+    """
+    try:
+        dirs: list[str] = []
+        stack = [os.fspath(path)]
+        with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as executor:
+            futures = []
+            while stack:
+                dir_path = stack.pop()
+                dirs.append(dir_path)
+                files = []
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            files.append(entry.path)
+                if files:
+                    futures.append(executor.submit(_unlink_all, files))
+            for future in futures:
+                future.result()
+        # Every directory was appended after its parent, so this removes children first
+        for dir_path in reversed(dirs):
+            os.rmdir(dir_path)
+    except OSError:
+        if not ignore_errors:
+            raise
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _unlink_all(paths: list[str]) -> None:
+    for path in paths:
+        os.unlink(path)
+
+
+def replace_dir(src: Path, dest: Path, work_dir: Path | None = None) -> None:
+    """
+    Replace the directory `dest` with the fully populated directory `src`, by renaming rather than copying.
+
+    Readers of `dest` see either the old or the new contents, never a partially written tree, and a failure
+    while populating `src` leaves `dest` untouched. The old contents are moved aside and deleted in a background
+    thread, so the caller does not wait for the deletion (the interpreter still waits for it before exiting).
+
+    Args:
+        src: Directory holding the new contents; must be on the same filesystem as `dest`
+        dest: Directory to replace
+        work_dir: Directory to move the old contents into while they are deleted (defaults to the parent of
+            `dest`); must be on the same filesystem as `dest`
+    """
+    trash_dir = None
+    if dest.exists():
+        trash_dir = Path(tempfile.mkdtemp(prefix=f'.{dest.name}.old-', dir=work_dir or dest.parent))
+        os.replace(dest, trash_dir / dest.name)
+    os.replace(src, dest)
+    if trash_dir is not None:
+        threading.Thread(target=remove_tree, args=(trash_dir,), kwargs={'ignore_errors': True}).start()
+
+
+def sync_tree(
+    src: Path,
+    dest: Path,
+    keep: Iterable[str] = (),
+    exclude: Iterable[str] = ('.*',),
+    link: bool = False,
+    jobs: int | None = None,
+) -> None:
+    """
+    Make `dest` a mirror of `src`, copying only new or changed files and deleting stale ones.
+
+    Unlike a full recopy, repeated syncs of an unchanged tree cost only a directory walk. Uses `rsync` (POSIX)
+    or `robocopy /MIR` (Windows) where available, falling back to a Python implementation that compares file
+    sizes and modification times. By default, hidden files in `src` are skipped, and hidden files in `dest` are
+    left alone.
+
+    Args:
+        src: Source directory
+        dest: Destination directory
+        keep: Names of top-level entries in `dest` that must never be deleted (e.g. generated output)
+        exclude: Glob patterns for names that are neither copied from `src` nor deleted from `dest`; as with
+            rsync, patterns starting with '/' only match top-level entries
+        link: Hardlink new or changed files instead of copying them (see `link_file`); robocopy always copies
+        jobs: Number of worker threads for the Python fallback (defaults to `default_jobs()`)
+    """
+    dest.mkdir(parents=True, exist_ok=True)
+    keep = set(keep)
+    exclude = list(exclude)
+    nested_exclude = [pattern for pattern in exclude if not pattern.startswith('/')]
+    top_level_exclude = [pattern[1:] for pattern in exclude if pattern.startswith('/')]
+
+    if sys.platform == 'win32':
+        # Excluded files and directories are neither copied nor purged; robocopy matches full paths or names
+        top_level_paths = [str(root / name) for name in top_level_exclude for root in (src, dest)]
+        cmd = ['robocopy', str(src), str(dest), '/MIR', '/MT:32', '/NFL', '/NDL', '/NJH', '/NJS', '/NP']
+        cmd += ['/XF', *nested_exclude, *top_level_paths]
+        cmd += ['/XD', *nested_exclude, *top_level_paths, *(str(dest / name) for name in keep)]
+        ok_returncodes = ROBOCOPY_OK_RETURNCODES
+    else:
+        cmd = ['rsync', '-a', '--delete', *(f'--exclude={pattern}' for pattern in exclude)]
+        cmd += [f'--filter=P /{name}' for name in keep]
+        if link:
+            cmd.append(f'--link-dest={src.resolve()}')  # Links every file that is identical to itself in `src`
+        cmd += [f'{src}{os.sep}', f'{dest}{os.sep}']
+        ok_returncodes = range(1)
+
+    if _run_native(cmd, ok_returncodes):
+        return
+
+    to_copy: list[tuple[str, Path, os.stat_result]] = []
+    new_dirs: list[tuple[str, Path]] = []
+    is_excluded = _name_matcher([*nested_exclude, *top_level_exclude])
+    is_nested_excluded = _name_matcher(nested_exclude)
+    _collect_sync_tasks(src, dest, keep, is_excluded, is_nested_excluded, to_copy, new_dirs)
+
+    def ignore(_dir: str, names: list[str]) -> set[str]:
+        return {name for name in names if is_nested_excluded(name)}
+
+    copy_function = link_file if link else copy_file
+    with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as executor:
+        futures = [
+            executor.submit(shutil.copytree, src_dir, target, ignore=ignore, copy_function=copy_function)
+            for src_dir, target in new_dirs
+        ]
+        futures += [executor.submit(copy_function, *task) for task in to_copy]
+        for future in futures:
+            future.result()
+
+
+def _name_matcher(patterns: list[str]) -> Callable[[str], bool]:
+    """
+    Return a predicate that tests whether a name matches any of the glob `patterns`.
+
+    Patterns without wildcards are looked up in a set, and the rest are combined into a single compiled regex,
+    so that testing a name costs at most one hash lookup and one regex match regardless of the pattern count.
+    """
+    names = frozenset(pattern for pattern in patterns if not _GLOB_CHARS_RE.search(pattern))
+    globs = [pattern for pattern in patterns if pattern not in names]
+    if not globs:
+        return names.__contains__
+    match = re.compile('|'.join(fnmatch.translate(pattern) for pattern in globs)).match
+    return lambda name: name in names or match(name) is not None
+
+
+def _collect_sync_tasks(
+    src: Path,
+    dest: Path,
+    keep: set[str],
+    is_excluded: Callable[[str], bool],
+    is_nested_excluded: Callable[[str], bool],
+    to_copy: list[tuple[str, Path, os.stat_result]],
+    new_dirs: list[tuple[str, Path]],
+) -> None:
+    """
+    Delete stale entries under `dest` and collect the files that need to be copied from `src`.
+
+    `is_excluded` applies to the entries of `src` and `dest` themselves, `is_nested_excluded` to those of their
+    subdirectories. Directories that are missing from `dest` altogether are collected in `new_dirs` instead of
+    being walked here, since there is nothing to compare against; each is later copied by a single `copytree`
+    walk.
+    """
+    with os.scandir(src) as it:
+        src_entries = {entry.name: entry for entry in it if not is_excluded(entry.name)}
+
+    # Remove entries that no longer exist in the source (or have changed between file and directory)
+    with os.scandir(dest) as it:
+        for entry in it:
+            if entry.name in keep or is_excluded(entry.name):
+                continue
+            src_entry = src_entries.get(entry.name)
+            if src_entry is not None and src_entry.is_dir() == entry.is_dir(follow_symlinks=False):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+    for name, entry in src_entries.items():
+        target = dest / name
+        if entry.is_dir():
+            if target.is_dir():
+                _collect_sync_tasks(
+                    Path(entry.path), target, set(), is_nested_excluded, is_nested_excluded, to_copy, new_dirs
+                )
+            else:
+                new_dirs.append((entry.path, target))
+        else:
+            _collect_changed_file(entry, target, to_copy)
+
+
+def _collect_changed_file(entry: os.DirEntry, target: Path, to_copy: list[tuple[str, Path, os.stat_result]]) -> None:
+    """Collect the file `entry` for copying to `target` if it is missing there or differs in size or mtime."""
+    src_stat = entry.stat()
+    try:
+        dest_stat = target.stat()
+    except FileNotFoundError:
+        to_copy.append((entry.path, target, src_stat))
+        return
+    if dest_stat.st_size != src_stat.st_size or int(dest_stat.st_mtime) != int(src_stat.st_mtime):
+        # Like rsync, replace the file rather than writing into it, in case it is hardlinked elsewhere
+        target.unlink()
+        to_copy.append((entry.path, target, src_stat))
+
+
+def read_json(path: Path) -> Any:
+    """Load a JSON file, using `orjson` if it is installed."""
+    if HAS_ORJSON:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def write_json(path: Path, obj: Any) -> bool:
+    """
+    Write `obj` to a JSON file with 2-space indentation, using `orjson` if it is installed.
+
+    `orjson` is several times faster than `json.dump(..., indent=2)`, whose indenting encoder is pure Python.
+    Either way, non-ASCII characters are written as UTF-8 rather than escaped. If the file already has
+    exactly this content it is left untouched; otherwise it is written under a temporary name and then renamed into
+    place, so readers never see a partially written file.
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    if HAS_ORJSON:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        # Like orjson, write non-ASCII characters as UTF-8, so that the output is the same with either encoder
+        data = json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
@@ -4,12 +4,28 @@ Docs.json updater for Mintlifier documentation.
 Updates the Mintlify navigation structure with generated SDK documentation.
 """
 
-import json
+import re
 from pathlib import Path
 from typing import Dict, Iterable, List
 from datetime import datetime
 import shutil
 
+from pixeltable_doctools.fileutils import read_json, write_json
+
+# Version dropdown names like "v0.4" or "0.4.2"
+_VERSION_RE = re.compile(r'v?(\d+(?:\.\d+)*)')
+
+
+def _dropdown_version_key(dropdown: Dict) -> tuple:
+    """Parse a dropdown's version string to a tuple for sorting; "latest" sorts above all versions."""
+    version_str = dropdown.get("dropdown", "")
+    if version_str == "latest":
+        return (float('inf'),)
+    m = _VERSION_RE.fullmatch(version_str) if isinstance(version_str, str) else None
+    if m is None:
+        return (0,)  # Unparseable versions sort last
+    return tuple(int(x) for x in m.group(1).split('.'))
+
 
 class DocsJsonUpdater:
     """Updates docs.json with SDK navigation structure."""
@@ -23,8 +39,7 @@ class DocsJsonUpdater:
     def load(self):
         """Load docs.json."""
         # Load docs.json
-        with open(self.docs_json_path) as f:
-            self.docs_config = json.load(f)
+        self.docs_config = read_json(self.docs_json_path)
 
         print(f"📋 Loaded docs.json with {len(self.docs_config.get('navigation', {}).get('tabs', []))} tabs")
 
@@ -87,8 +102,7 @@ class DocsJsonUpdater:
             raise ValueError("No configuration to save")
 
         # Write with proper formatting
-        with open(self.docs_json_path, "w") as f:
-            json.dump(self.docs_config, f, indent=2)
+        write_json(self.docs_json_path, self.docs_config)
 
         print(f"✅ Updated {self.docs_json_path}")
 
@@ -102,28 +116,8 @@ class DocsJsonUpdater:
         Returns:
             Sorted list with newest versions first
         """
-        def parse_version(dropdown: Dict) -> tuple:
-            """Parse version string to tuple for sorting."""
-            version_str = dropdown.get("dropdown", "")
-
-            # Handle "latest" specially - always put it first
-            if version_str == "latest":
-                return (float('inf'),)
-
-            # Parse version like "v0.4" -> (0, 4)
-            # Strip 'v' prefix and split by '.'
-            if version_str.startswith("v"):
-                version_str = version_str[1:]
-
-            try:
-                parts = [int(x) for x in version_str.split('.')]
-                return tuple(parts)
-            except (ValueError, AttributeError):
-                # If parsing fails, return (0,) so it sorts last
-                return (0,)
-
         # Sort by version in descending order (reverse=True for newest first)
-        return sorted(list(dropdowns), key=parse_version, reverse=True)
+        return sorted(dropdowns, key=_dropdown_version_key, reverse=True)
 
     def validate_structure(self, navigation_structure: Dict) -> List[str]:
         """Validate navigation structure and return any warnings."""
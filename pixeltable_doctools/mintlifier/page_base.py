@@ -4,7 +4,6 @@ from docstring_parser.common import Docstring
 import re
 import inspect
 import subprocess
-import tempfile
 from pathlib import Path
 from typing import Optional, Any, List
 
@@ -158,24 +157,18 @@ class PageBase:
         This ensures consistent formatting for code examples in documentation.
         """
         try:
-            # Create a temporary Python file with the code
-            with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
-                f.write(code)
-                temp_path = f.name
-
-            try:
-                # Run ruff format on the temp file
-                # line length 74 ensures all text is visible in mintlify display
-                subprocess.run(["ruff", "format", temp_path, "--line-length", "74"], capture_output=True, text=True, check=True, timeout=5)
-
-                # Read back the formatted content
-                with open(temp_path, "r") as f:
-                    formatted = f.read()
-
-                return formatted.strip()
-            finally:
-                # Clean up temp file
-                Path(temp_path).unlink(missing_ok=True)
+            # Pipe the code through ruff format, rather than formatting a temporary file in place
+            # line length 74 ensures all text is visible in mintlify display
+            result = subprocess.run(
+                ["ruff", "format", "--line-length", "74", "-"],
+                input=code,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+                timeout=5,
+            )
+            return result.stdout.strip()
         except Exception:
             # If ruff fails, return original
             return code
@@ -0,0 +1,165 @@
+"""
+Shared subprocess helpers for doctools.
+
+This module provides streamed process execution for the build and deploy scripts, so that the output of
+long-running tools is shown as it is produced rather than buffered until exit, and keeps the output of build
+steps that run concurrently from being interleaved.
+"""
+
+import io
+import queue
+import subprocess
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Callable, Iterator, Sequence
+
+
+class LineReader:
+    """Reads lines from a text stream in a background thread, so that they can be consumed with a timeout."""
+
+    def __init__(self, stream: IO[str]):
+        """Start reading from `stream`."""
+        self._queue: queue.Queue[str] = queue.Queue()
+        threading.Thread(target=self._pump, args=(stream,), daemon=True).start()
+
+    def _pump(self, stream: IO[str]) -> None:
+        for line in stream:
+            self._queue.put(line)
+        self._queue.put('')  # EOF
+
+    def readline(self, timeout: float) -> str | None:
+        """Return the next line, '' at end of stream, or None if no line arrived within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+# Number of trailing output lines of a failed command that are kept for its error
+OUTPUT_TAIL_LINES = 200
+
+
+def run_streamed(cmd: Sequence[str], cwd: Path | None = None) -> None:
+    """
+    Run a command, forwarding its output to our stdout line by line as it is produced.
+
+    The command's stderr is merged into its stdout, so the two stay in order and a single reader suffices. Only the
+    last `OUTPUT_TAIL_LINES` lines are retained, so memory use does not grow with the command's output.
+
+    Args:
+        cmd: Command and arguments
+        cwd: Working directory for the command
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a nonzero status; its `output` holds the tail of
+            the command's output
+    """
+    tail: deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+    with subprocess.Popen(
+        cmd,
+        cwd=None if cwd is None else str(cwd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    ) as proc:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            tail.append(line)
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=''.join(tail))
+
+
+# Name of the build step run by the current thread, if any
+_current_step = threading.local()
+
+
+class _StepLineWriter(io.TextIOBase):
+    """
+    Text stream that writes whole lines to an underlying stream, prefixed with the name of the writing thread's step.
+
+    Text is buffered per thread until the end of a line, and each batch of complete lines is written in a single
+    call under a lock, so that lines printed by different threads are never mixed up.
+    """
+
+    def __init__(self, stream: IO[str], lock: threading.Lock):
+        """Write to `stream`, holding `lock` for each write."""
+        self._stream = stream
+        self._lock = lock
+        self._buffers = threading.local()
+
+    @property
+    def encoding(self) -> str:
+        return self._stream.encoding
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        *lines, rest = (getattr(self._buffers, 'text', '') + text).split('\n')
+        self._buffers.text = rest
+        if lines:
+            self._write_lines(lines)
+        return len(text)
+
+    def flush(self) -> None:
+        # Partial lines stay buffered until they are completed (or the step ends)
+        with self._lock:
+            self._stream.flush()
+
+    def end_line(self) -> None:
+        """Write out the current thread's partial line, if any."""
+        if getattr(self._buffers, 'text', ''):
+            self._write_lines([self._buffers.text])
+            self._buffers.text = ''
+
+    def _write_lines(self, lines: list[str]) -> None:
+        step = getattr(_current_step, 'name', None)
+        prefix = f'[{step}] ' if step else ''
+        # Blank lines (which separate the output of successive steps) are not prefixed
+        text = ''.join(f'{prefix}{line}\n' if line else '\n' for line in lines)
+        with self._lock:
+            self._stream.write(text)
+            self._stream.flush()
+
+
+@contextmanager
+def step_output() -> Iterator[None]:
+    """
+    Serialize the output of build steps that run concurrently while inside the context.
+
+    `sys.stdout` and `sys.stderr` are replaced with streams that write whole lines, prefixed with the name of the
+    step run by the writing thread (see `run_step()`). This also covers the output of subprocesses run with
+    `run_streamed()`, but not that of subprocesses that write to the inherited file descriptors directly.
+    """
+    lock = threading.Lock()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _StepLineWriter(stdout, lock), _StepLineWriter(stderr, lock)
+    try:
+        yield
+    finally:
+        sys.stdout.end_line()
+        sys.stderr.end_line()
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def run_step(name: str, step: Callable[..., Any], *args: Any) -> Any:
+    """Run `step(*args)` as the build step `name`, whose output lines are prefixed with `[name]`."""
+    _current_step.name = name
+    try:
+        return step(*args)
+    finally:
+        if isinstance(sys.stdout, _StepLineWriter):
+            sys.stdout.end_line()
+        if isinstance(sys.stderr, _StepLineWriter):
+            sys.stderr.end_line()
+        _current_step.name = None